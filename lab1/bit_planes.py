@@ -0,0 +1,27 @@
+import numpy as np
+from PIL import Image
+
+
+def get_bit_planes(image):
+    # planes[c * 8 + k] is bit k of channel c: 24 planes for RGB, 8 for L
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    pixels = np.asarray(image)
+    if pixels.ndim == 2:
+        pixels = pixels[..., None]
+    channels = np.moveaxis(pixels, -1, 0)[:, None]
+    planes = np.unpackbits(channels, axis=1, bitorder="little")
+    return planes.reshape(-1, *pixels.shape[:2])
+
+
+def get_bit_mosaic(image, gap=4):
+    # one row of tiles per channel, bits 7..0 from left to right
+    planes = get_bit_planes(image) * np.uint8(255)
+    height, width = planes.shape[1:]
+    tiles = planes.reshape(-1, 8, height, width)[:, ::-1]
+    tiles = np.pad(tiles, ((0, 0), (0, 0), (0, gap), (0, gap)), constant_values=128)
+    rows = tiles.shape[0]
+    mosaic = tiles.transpose(0, 2, 1, 3).reshape(
+        rows * (height + gap), 8 * (width + gap)
+    )
+    return Image.fromarray(mosaic[: mosaic.shape[0] - gap, : mosaic.shape[1] - gap])
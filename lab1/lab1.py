@@ -1,18 +1,13 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image
+from bit_planes import get_bit_planes, get_bit_mosaic
 
 def get_bit_image(image_path, bit_position):
     image = Image.open(image_path).convert("RGB")
-    binary_image = Image.new('1', image.size)
-    
-    for x in range(image.width):
-        for y in range(image.height):
-            pixel = image.getpixel((x, y))
-            bit_value = ((pixel[0] >> bit_position) & 1) | ((pixel[1] >> bit_position) & 1) | ((pixel[2] >> bit_position) & 1)
-            binary_image.putpixel((x, y), bit_value)
-    
-    return binary_image
+    planes = get_bit_planes(image)
+    bit_value = planes[bit_position::8].any(axis=0)
+    return Image.fromarray(bit_value)
 
 def select_image():
     global image_path
@@ -40,10 +35,21 @@ def visualize():
     except Exception as e:
         messagebox.showerror("Ошибка", str(e))
 
+def visualize_mosaic():
+    try:
+        mosaic = get_bit_mosaic(Image.open(image_path))
+        mosaic.show()
+
+        if save_checkbox_var.get():
+            save_image(mosaic)
+
+    except Exception as e:
+        messagebox.showerror("Ошибка", str(e))
+
 root = tk.Tk()
 root.title("Визуализация битов изображения")
 
-root.geometry("640x400")
+root.geometry("640x460")
 
 image_label = tk.Label(root, text="Визуализация битов изображения", font=("Arial", 12))
 image_label.pack(pady=10)
@@ -64,4 +70,7 @@ save_checkbox.pack(pady=10)
 visualize_button = tk.Button(root, text="Визуализировать", command=visualize, font=("Arial", 12), width=20)
 visualize_button.pack(pady=10)
 
+mosaic_button = tk.Button(root, text="Все битовые плоскости", command=visualize_mosaic, font=("Arial", 12), width=20)
+mosaic_button.pack(pady=10)
+
 root.mainloop()
@@ -9,6 +9,9 @@ from PyQt6.QtGui import QPixmap, QImage
 from PyQt6.QtCore import Qt
 import math
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import payload
+
 
 class SteganographyApp(QMainWindow):
     def __init__(self):
@@ -212,14 +215,8 @@ class SteganographyApp(QMainWindow):
         self.save_stego_btn.setEnabled(True)
 
     def text_to_bits(self, text):
-        """Преобразует текст в последовательность бит"""
-        bits = []
-        for char in text:
-            # Преобразование символа в 8 бит
-            byte = format(ord(char), '08b')
-            for bit in byte:
-                bits.append(int(bit))
-        return bits
+        """Преобразует текст (UTF-8) в массив бит"""
+        return payload.text_to_bits(text)
 
     def lsb_matching_revisited(self, img_array, message_bits):
         """Реализация метода LSB Matching Revisited"""
@@ -227,46 +224,27 @@ class SteganographyApp(QMainWindow):
         stego_array = img_array.copy()
 
         # Добавляем длину сообщения в начало
-        message_length = len(message_bits)
-        length_bits = format(message_length, '032b')
-        full_message = [int(bit) for bit in length_bits] + message_bits
-
-        # Встраивание данных
-        idx = 0
-        for i in range(height):
-            for j in range(0, width, 2):
-                if j + 1 < width and idx < len(full_message):
-                    # Получаем пару пикселей
-                    x1 = stego_array[i, j]
-                    x2 = stego_array[i, j + 1]
-
-                    # Извлекаем LSB
-                    lsb1 = x1 & 1
-                    lsb2 = x2 & 1
-
-                    # Бит для встраивания
-                    m = full_message[idx]
-
-                    # Применение LSB Matching Revisited
-                    if lsb1 != m:
-                        # Если LSB первого пикселя не равен биту сообщения
-                        if (x1 % 2 == 0 and x2 % 2 == 0) or (x1 % 2 == 1 and x2 % 2 == 1):
-                            # Оба пикселя имеют одинаковую четность
-                            x1 = x1 + 1 if x1 < 255 else x1 - 1
-                        else:
-                            # Пиксели имеют разную четность
-                            x2 = x2 + 1 if x2 < 255 else x2 - 1
-
-                    # Обновляем пиксели
-                    stego_array[i, j] = x1
-                    stego_array[i, j + 1] = x2
-
-                    idx += 1
-
-                    if idx >= len(full_message):
-                        break
-            if idx >= len(full_message):
-                break
+        full_message = payload.add_length(message_bits)
+
+        # Пары соседних пикселей в каждой строке, построчно
+        pair_width = width - width % 2
+        pairs = stego_array[:, :pair_width].reshape(-1, 2).astype(np.int16)
+        count = min(len(full_message), len(pairs))
+        x1 = pairs[:count, 0]
+        x2 = pairs[:count, 1]
+        m = full_message[:count]
+
+        # Условия четности сразу для всего сообщения
+        mismatch = (x1 & 1) != m
+        same_parity = (x1 & 1) == (x2 & 1)
+        change_first = mismatch & same_parity
+        change_second = mismatch & ~same_parity
+
+        # +1, а для 255 -1, чтобы не выйти за границы
+        x1[change_first] += np.where(x1[change_first] < 255, 1, -1)
+        x2[change_second] += np.where(x2[change_second] < 255, 1, -1)
+
+        stego_array[:, :pair_width] = pairs.reshape(height, pair_width)
 
         return stego_array
 
@@ -334,80 +312,25 @@ class SteganographyApp(QMainWindow):
 
         # Преобразование в массив
         stego_array = np.array(self.stego_image)
-        height, width = stego_array.shape
-
-        # Извлечение данных
-        extracted_bits = []
-
-        # Сначала извлекаем 32 бита длины сообщения
-        idx = 0
-        length_bits = []
-
-        for i in range(height):
-            for j in range(0, width, 2):
-                if j + 1 < width and idx < 32:
-                    x1 = stego_array[i, j]
-                    x2 = stego_array[i, j + 1]
-
-                    # Извлекаем бит согласно алгоритму LSB Matching Revisited
-                    extracted_bit = x1 & 1
-                    length_bits.append(extracted_bit)
-
-                    idx += 1
-
-                    if idx >= 32:
-                        break
-            if idx >= 32:
-                break
-
-        # Преобразуем биты длины в число
-        message_length = 0
-        for bit in length_bits:
-            message_length = (message_length << 1) | bit
-
-        # Теперь извлекаем само сообщение
-        idx = 0
-        for i in range(height):
-            for j in range(0, width, 2):
-                if j + 1 < width:
-                    # Пропускаем первые 32 бита (длина)
-                    if idx < 32:
-                        idx += 1
-                        continue
-
-                    if len(extracted_bits) >= message_length:
-                        break
-
-                    x1 = stego_array[i, j]
-                    x2 = stego_array[i, j + 1]
-
-                    # Извлекаем бит
-                    extracted_bit = x1 & 1
-                    extracted_bits.append(extracted_bit)
-
-                    if len(extracted_bits) >= message_length:
-                        break
-            if len(extracted_bits) >= message_length:
-                break
+        extracted_bits = self.extract_bits(stego_array)
 
         # Преобразуем биты в текст
         extracted_text = self.bits_to_text(extracted_bits)
 
         return extracted_text
 
+    def extract_bits(self, stego_array):
+        """Извлекает биты сообщения из LSB первых пикселей пар"""
+        height, width = stego_array.shape
+        pair_width = width - width % 2
+        bits = (stego_array[:, 0:pair_width:2] & 1).ravel()
+
+        # Сначала 32 бита длины сообщения
+        return payload.split_length(bits)
+
     def bits_to_text(self, bits):
-        """Преобразует последовательность бит в текст"""
-        text = ""
-        # Группируем биты по 8 (один символ)
-        for i in range(0, len(bits), 8):
-            byte = bits[i:i + 8]
-            if len(byte) == 8:  # Проверяем, что у нас полный байт
-                # Преобразуем 8 бит в символ
-                char_code = 0
-                for bit in byte:
-                    char_code = (char_code << 1) | bit
-                text += chr(char_code)
-        return text
+        """Преобразует последовательность бит в текст (UTF-8)"""
+        return payload.bits_to_text(bits)
 
 def main():
     app = QApplication(sys.argv)
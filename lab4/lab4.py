@@ -9,6 +9,9 @@ from PyQt6.QtGui import QPixmap, QImage
 from PyQt6.QtCore import Qt
 import math
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import payload
+
 
 class SteganographyApp(QMainWindow):
     def __init__(self):
@@ -216,40 +219,50 @@ class SteganographyApp(QMainWindow):
         stego_array = img_array.copy()
 
         # Добавляем длину сообщения в начало
-        message_length = len(message_bits)
-        length_bits = format(message_length, '032b')
-        full_message = [int(bit) for bit in length_bits] + message_bits
-
-        # Встраивание данных
-        idx = 0
-        for i in range(height):
-            for j in range(width):
-                if idx < len(full_message):
-                    # Получаем текущий пиксель
-                    pixel_value = stego_array[i, j]
-
-                    # Применяем интерполяцию
-                    if j < width - 1:
-                        next_pixel_value = stego_array[i, j + 1]
-                        interpolated_value = (pixel_value + next_pixel_value) // 2
-
-                        # Встраиваем бит
-                        if full_message[idx] == 1:
-                            if interpolated_value % 2 == 0:
-                                stego_array[i, j] += 1
-                        else:
-                            if interpolated_value % 2 == 1:
-                                stego_array[i, j] -= 1
-
-                    idx += 1
-
-                if idx >= len(full_message):
-                    break
-            if idx >= len(full_message):
-                break
+        full_message = payload.add_length(message_bits)
+
+        # Бит k сообщения приходится на k-й пиксель в порядке обхода строк;
+        # последний столбец строки бит не несет, но позицию занимает
+        count = min(len(full_message), height * width)
+        bits = np.zeros(height * width, dtype=np.uint8)
+        bits[:count] = full_message[:count]
+        active = np.arange(height * width) < count
+        bits = bits.reshape(height, width)[:, :-1]
+        active = active.reshape(height, width)[:, :-1]
+
+        # Пиксель меняется только на своем шаге, а правый сосед еще исходный,
+        # поэтому интерполяцию можно посчитать сразу для всего изображения
+        interpolated = (stego_array[:, :-1] + stego_array[:, 1:]) // 2
+        parity = interpolated % 2
+        increment = active & (bits == 1) & (parity == 0)
+        decrement = active & (bits == 0) & (parity == 1)
+
+        stego_array[:, :-1] += increment.astype(stego_array.dtype)
+        stego_array[:, :-1] -= decrement.astype(stego_array.dtype)
 
         return stego_array
 
+    def extract_data(self):
+        """Извлечение данных из стегоконтейнера (дополнительная функция)"""
+        if not self.stego_image:
+            QMessageBox.warning(self, "Ошибка", "Сначала создайте стегоконтейнер!")
+            return
+
+        stego_array = np.array(self.stego_image)
+        extracted_bits = self.extract_bits(stego_array)
+
+        return self.bits_to_text(extracted_bits)
+
+    def extract_bits(self, stego_array):
+        """Извлекает биты сообщения по четности интерполированных значений"""
+        height, width = stego_array.shape
+        bits = np.zeros((height, width), dtype=np.uint8)
+        interpolated = (stego_array[:, :-1] + stego_array[:, 1:]) // 2
+        bits[:, :-1] = interpolated % 2
+
+        # Сначала 32 бита длины сообщения
+        return payload.split_length(bits.ravel())
+
     def save_stego_image(self):
         """Сохранение стегоконтейнера"""
         if not self.stego_image:
@@ -277,14 +290,12 @@ class SteganographyApp(QMainWindow):
             self.display_image(self.stego_image, self.stego_image_label)
 
     def text_to_bits(self, text):
-        """Преобразует текст в последовательность бит"""
-        bits = []
-        for char in text:
-            # Преобразование символа в 8 бит
-            byte = format(ord(char), '08b')
-            for bit in byte:
-                bits.append(int(bit))
-        return bits
+        """Преобразует текст (UTF-8) в массив бит"""
+        return payload.text_to_bits(text)
+
+    def bits_to_text(self, bits):
+        """Преобразует последовательность бит в текст (UTF-8)"""
+        return payload.bits_to_text(bits)
 
     def display_image(self, img, label):
         """Отображение изображения с учетом масштаба"""
@@ -1,4 +1,7 @@
 import sys
+import os
+import itertools
+import pathlib
 from PIL import Image
 import numpy as np
 from scipy import stats as scipy_stats
@@ -8,17 +11,17 @@ import scipy.io
 class Attacker:
     @staticmethod
     def attack_image(img_in: Image.Image, bit_index: int) -> Image.Image:
-        img = Image.new("L", img_in.size)
-        pixels_in = img_in.load()
-        pixels = img.load()
+        pixels = np.asarray(img_in, dtype=np.uint8)
+        plane = (pixels >> bit_index) & 1
+        return Image.fromarray(plane * np.uint8(255))
 
-        if pixels_in is None or pixels is None:
-            raise BaseException("pixel arrays are none")
-
-        for x in range(img.size[0]):
-            for y in range(img.size[1]):
-                pixels[x, y] = 255 * (pixels_in[x, y] & (1 << bit_index))
-        return img
+    @staticmethod
+    def attack_image_planes(img_in: Image.Image) -> list[Image.Image]:
+        pixels = np.asarray(img_in, dtype=np.uint8)
+        # planes[i] holds bit i of every pixel, least significant first
+        planes = np.unpackbits(pixels[None], axis=0, bitorder="little")
+        planes *= 255
+        return [Image.fromarray(plane) for plane in planes]
 
 
 class Chi2:
@@ -26,90 +29,108 @@ class Chi2:
 
     @staticmethod
     def analyze(image: Image.Image, block_size: int = 64):
-        pixels = image.load()
-        if pixels is None:
-            raise BaseException
+        counts = Chi2.__block_counts(image, block_size)
         outs = []
 
-        for x_max in range(0, image.width, block_size):
-            for y_max in range(0, image.height, block_size):
-                x_min = min(0, x_max - block_size)
-                y_min = min(0, y_max - block_size)
-
-                distribution_actual: list[int] = [0] * 8
-                for x in range(x_min, x_max):
-                    for y in range(y_min, y_max):
-                        distribution_actual[pixels[x, y] & 0b111] += 1
-
-                distribution_mean: list[int] = [0] * len(distribution_actual)
-                for index in range(0, len(distribution_actual) - 1, 2):
-                    mean = (
-                        distribution_actual[index] + distribution_actual[index + 1]
-                    ) / 2
-                    if mean.is_integer():
-                        distribution_mean[index] = distribution_mean[index + 1] = int(
-                            mean
-                        )
-                    elif distribution_actual[index] < distribution_actual[index + 1]:
-                        distribution_mean[index] = int(mean)
-                        distribution_mean[index + 1] = int(mean) + 1
+        # pair-of-values expectation: each pair shares its total, the odd
+        # remainder goes to the more populated value of the pair
+        pair_sums = counts[:, 0::2] + counts[:, 1::2]
+        first_smaller = counts[:, 0::2] < counts[:, 1::2]
+        expected = np.empty_like(counts)
+        expected[:, 0::2] = np.where(
+            first_smaller, pair_sums // 2, pair_sums - pair_sums // 2
+        )
+        expected[:, 1::2] = pair_sums - expected[:, 0::2]
+
+        for distribution_actual, distribution_mean in zip(
+            counts.tolist(), expected.tolist()
+        ):
+            # combine bins
+            index = 0
+            Chi2.__MIN_BIN = np.average(distribution_actual)
+            while index < len(distribution_actual):
+                if distribution_actual[index] < Chi2.__MIN_BIN:
+                    val_sum = distribution_actual[index]
+                    stop = index
+                    for jindex in range(index + 1, len(distribution_actual)):
+                        val_sum += distribution_actual[jindex]
+                        if val_sum >= Chi2.__MIN_BIN:
+                            stop = jindex
+                            break
                     else:
-                        distribution_mean[index] = int(mean) + 1
-                        distribution_mean[index + 1] = int(mean)
-
-                # combine bins
-                index = 0
-                Chi2.__MIN_BIN = np.average(distribution_actual)
-                while index < len(distribution_actual):
-                    if distribution_actual[index] < Chi2.__MIN_BIN:
-                        val_sum = distribution_actual[index]
-                        stop = index
-                        for jindex in range(index + 1, len(distribution_actual)):
-                            val_sum += distribution_actual[jindex]
-                            if val_sum >= Chi2.__MIN_BIN:
-                                stop = jindex
-                                break
-                        else:
-                            stop = len(distribution_actual) - 1
-
-                        distribution_actual[index : stop + 1] = [
-                            sum(distribution_actual[index : stop + 1])
-                        ]
-                        distribution_mean[index : stop + 1] = [
-                            sum(distribution_mean[index : stop + 1])
-                        ]
-
-                    index += 1
-                if distribution_actual[-1] < Chi2.__MIN_BIN:
-                    distribution_actual[-2:] = [sum(distribution_actual[-2:])]
-                    distribution_mean[-2:] = [sum(distribution_mean[-2:])]
-                del index
-                # print(distribution_actual)
-                # print(distribution_mean)
-                for x in distribution_actual:
-                    if x == 0:
-                        break
-                else:
-                    if len(distribution_actual) == 2:
-                        if distribution_actual[0] == 0 or distribution_actual[1] == 0:
-                            outs.append(1)
-                            continue
-
-                    if len(distribution_actual) == 1:
+                        stop = len(distribution_actual) - 1
+
+                    distribution_actual[index : stop + 1] = [
+                        sum(distribution_actual[index : stop + 1])
+                    ]
+                    distribution_mean[index : stop + 1] = [
+                        sum(distribution_mean[index : stop + 1])
+                    ]
+
+                index += 1
+            if distribution_actual[-1] < Chi2.__MIN_BIN:
+                distribution_actual[-2:] = [sum(distribution_actual[-2:])]
+                distribution_mean[-2:] = [sum(distribution_mean[-2:])]
+            del index
+            # print(distribution_actual)
+            # print(distribution_mean)
+            for x in distribution_actual:
+                if x == 0:
+                    break
+            else:
+                if len(distribution_actual) == 2:
+                    if distribution_actual[0] == 0 or distribution_actual[1] == 0:
                         outs.append(1)
                         continue
 
-                    outs.append(
-                        scipy_stats.chisquare(
-                            f_obs=distribution_actual, f_exp=distribution_mean, ddof=1
-                        )[1]
-                    )
+                if len(distribution_actual) == 1:
+                    outs.append(1)
+                    continue
+
+                outs.append(
+                    scipy_stats.chisquare(
+                        f_obs=distribution_actual, f_exp=distribution_mean, ddof=1
+                    )[1]
+                )
         # outs = [x for x in outs if x > 0.000001]
         # print(outs)
         print(np.average(outs))
         return np.average(outs) < 0.5
         # return len(outs) > 2 * len([x for x in outs if x > 0.05])
 
+    @staticmethod
+    def __block_counts(image: Image.Image, block_size: int) -> np.ndarray:
+        pixels = np.asarray(image)
+        if pixels.ndim != 2:
+            raise BaseException("only single channel images are supported")
+        classes = pixels & 0b111
+        height, width = classes.shape
+        blocks_y = -(-height // block_size)
+        blocks_x = -(-width // block_size)
+
+        tile_y = np.arange(height) // block_size
+        tile_x = np.arange(width) // block_size
+        tile_ids = tile_y[:, None] * blocks_x + tile_x[None, :]
+        tiles = np.bincount(
+            (tile_ids * 8 + classes).ravel(), minlength=blocks_y * blocks_x * 8
+        ).reshape(blocks_y, blocks_x, 8)
+
+        # the region of block (x_max, y_max) spans [0, x_max) x [0, y_max),
+        # a zero bound starts it at -block_size, i.e. at the far image edge
+        prefix = tiles.cumsum(axis=0).cumsum(axis=1)
+        right = np.zeros((blocks_y, 8), dtype=tiles.dtype)
+        np.add.at(right, (tile_y[:, None], classes[:, -block_size:]), 1)
+        bottom = np.zeros((blocks_x, 8), dtype=tiles.dtype)
+        np.add.at(bottom, (tile_x[None, :], classes[-block_size:, :]), 1)
+        corner = np.bincount(classes[-block_size:, -block_size:].ravel(), minlength=8)
+
+        counts = np.empty((blocks_x, blocks_y, 8), dtype=tiles.dtype)
+        counts[0, 0] = corner
+        counts[0, 1:] = right.cumsum(axis=0)[:-1]
+        counts[1:, 0] = bottom.cumsum(axis=0)[:-1]
+        counts[1:, 1:] = prefix[:-1, :-1].transpose(1, 0, 2)
+        return counts.reshape(-1, 8)
+
 
 class RSAnalysis:
     ANALYSIS_COLOR_GRAYSCALE = -1
@@ -117,19 +138,14 @@ class RSAnalysis:
     ANALYSIS_COLOR_GREEN = 1
     ANALYSIS_COLOR_BLUE = 2
 
+    # F1 and F-1 flipping functions tabulated for every byte value
+    __NEGATE_LSB = np.arange(256, dtype=np.int16) ^ 1
+    __INVERT_LSB = ((np.arange(256, dtype=np.int16) + 1) ^ 1) - 1
+
     def __init__(self, m: int, n: int):
-        self.__mMask = [[0] * (m * n), [0] * (m * n)]
-
-        k: int = 0
-        for i in range(n):
-            for j in range(m):
-                if ((j % 2) == 0 and (i % 2) == 0) or ((j % 2) == 1 and (i % 2) == 1):
-                    self.__mMask[0][k] = 1
-                    self.__mMask[1][k] = 0
-                else:
-                    self.__mMask[0][k] = 0
-                    self.__mMask[1][k] = 1
-                k += 1
+        i, j = np.divmod(np.arange(m * n), m)
+        positive = (i % 2) == (j % 2)
+        self.__mMask = np.stack((positive, ~positive))
 
         self.__mM = m
         self.__mN = n
@@ -142,74 +158,25 @@ class RSAnalysis:
         color: int = ANALYSIS_COLOR_GRAYSCALE,
         overlap: bool = True,
     ) -> bool:
+        ml = self.getResults(image, color, overlap)[26]
+        print(ml)
+
+        return ml > 0.001# процент определения сообщения
+
+    def getResults(
+        self,
+        image: Image.Image,
+        color: int = ANALYSIS_COLOR_GRAYSCALE,
+        overlap: bool = True,
+    ) -> list[float]:
         imgx: int = image.width
         imgy: int = image.height
 
-        startx: int = 0
-        starty: int = 0
-        block: list[int] = [0] * (self.__mM * self.__mN)
-
-        numregular: float = 0
-        numsingular: float = 0
-        numnegreg: float = 0
-        numnegsing: float = 0
-        numunusable: float = 0
-        numnegunusable: float = 0
-        variationB: float
-        variationP: float
-        variationN: float
-
-        pixels = image.load()
-        if pixels is None:
-            raise BaseException("pixels is none")
-
-        while startx < imgx and starty < imgy:
-            for m in range(2):
-                k: int = 0
-                for i in range(self.__mN):
-                    for j in range(self.__mM):
-                        block[k] = pixels[startx + j, starty + i]
-                        k += 1
-
-                variationB = self.__getVariation(block, color)
-
-                block = self.__flipBlock(block, self.__mMask[m])
-                variationP = self.__getVariation(block, color)
-                block = self.__flipBlock(block, self.__mMask[m])
-
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-                variationN = self.__getNegativeVariation(block, color, self.__mMask[m])
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-
-                if variationP > variationB:
-                    numregular += 1
-                if variationP < variationB:
-                    numsingular += 1
-                if variationP == variationB:
-                    numunusable += 1
-
-                if variationN > variationB:
-                    numnegreg += 1
-                if variationN < variationB:
-                    numnegsing += 1
-                if variationN == variationB:
-                    numnegunusable += 1
-
-            if overlap:
-                startx += 1
-            else:
-                startx += self.__mM
-
-            if startx >= (imgx - 1):
-                startx = 0
-                if overlap:
-                    starty += 1
-                else:
-                    starty += self.__mN
-            if starty >= (imgy - 1):
-                break
-        totalgroups: float = numregular + numsingular + numunusable
-        allpixels: list[float] = self.__getAllPixelFlips(image, color, overlap)
+        groups = self.__getGroups(image, color, overlap)
+        counts, allpixels = self.__classifyGroups(groups)
+        numregular, numsingular, numnegreg, numnegsing = counts
+
+        totalgroups: float = groups.shape[0] * len(self.__mMask)
         x: float = self.__getX(
             numregular,
             numnegreg,
@@ -265,9 +232,8 @@ class RSAnalysis:
         results[25] = epf
         results[26] = ml
         results[27] = ((imgx * imgy * 3) * ml) / 8
-        print(ml)
 
-        return ml > 0.001# процент определения сообщения
+        return results
 
     def __getX(
         self,
@@ -320,88 +286,70 @@ class RSAnalysis:
 
         return x
 
-    def __getAllPixelFlips(
-        self, image: Image.Image, color: int, overlap: bool
-    ) -> list[float]:
-        allmask: list[int] = [1] * (self.__mM * self.__mN)
+    def __getGroups(self, image: Image.Image, color: int, overlap: bool) -> np.ndarray:
+        pixels = np.asarray(image, dtype=np.int16)
+        if pixels.ndim != 2:
+            raise BaseException("only single channel images are supported")
 
-        imgx: int = image.width
-        imgy: int = image.height
-
-        startx: int = 0
-        starty: int = 0
-        block: list[int] = [0] * (self.__mM * self.__mN)
-
-        numregular: float = 0
-        numsingular: float = 0
-        numnegreg: float = 0
-        numnegsing: float = 0
-        numunusable: float = 0
-        numnegunusable: float = 0
-        variationB: float
-        variationP: float
-        variationN: float
-
-        pixels = image.load()
-        if pixels is None:
-            raise BaseException("pixels is none")
-
-        while startx < imgx and starty < imgy:
-            for m in range(2):
-                k: int = 0
-                for i in range(self.__mN):
-                    for j in range(self.__mM):
-                        block[k] = pixels[startx + j, starty + i]
-                        k += 1
-
-                block = self.__flipBlock(block, allmask)
-
-                variationB = self.__getVariation(block, color)
-
-                block = self.__flipBlock(block, self.__mMask[m])
-                variationP = self.__getVariation(block, color)
-                block = self.__flipBlock(block, self.__mMask[m])
-
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-                variationN = self.__getNegativeVariation(block, color, self.__mMask[m])
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-
-                if variationP > variationB:
-                    numregular += 1
-                if variationP < variationB:
-                    numsingular += 1
-                if variationP == variationB:
-                    numunusable += 1
-
-                if variationN > variationB:
-                    numnegreg += 1
-                if variationN < variationB:
-                    numnegsing += 1
-                if variationN == variationB:
-                    numnegunusable += 1
-
-            if overlap:
-                startx += 1
-            else:
-                startx += self.__mM
+        if overlap:
+            stepx, stepy = 1, 1
+        else:
+            stepx, stepy = self.__mM, self.__mN
 
-            if startx >= (imgx - 1):
-                startx = 0
-                if overlap:
-                    starty += 1
-                else:
-                    starty += self.__mN
-            if starty >= (imgy - 1):
-                break
+        # every group origin visited by the scan, one row of m * n pixels each
+        windows = np.lib.stride_tricks.sliding_window_view(
+            pixels, (self.__mN, self.__mM)
+        )[: image.height - 1 : stepy, : image.width - 1 : stepx]
+        return windows.reshape(-1, self.__mM * self.__mN)
 
+    def __classifyGroups(self, groups: np.ndarray) -> tuple[list[float], list[float]]:
         results: list[float] = [0] * 4
+        allpixels: list[float] = [0] * 4
+
+        allflipped = self.__NEGATE_LSB[groups]
+        variationB = self.__getVariation(groups)
+        variationAllB = self.__getVariation(allflipped)
+        variationP = [
+            self.__getVariation(self.__flipGroups(groups, mask, self.__NEGATE_LSB))
+            for mask in self.__mMask
+        ]
+
+        for m, mask in enumerate(self.__mMask):
+            variationN = self.__getVariation(
+                self.__flipGroups(groups, mask, self.__INVERT_LSB)
+            )
+            self.__countGroups(results, variationB, variationP[m], variationN)
+
+            # flipping one mask over the all flipped groups leaves only
+            # the complementary mask flipped relative to the original ones
+            variationAllN = self.__getVariation(
+                self.__flipGroups(allflipped, mask, self.__INVERT_LSB)
+            )
+            self.__countGroups(
+                allpixels, variationAllB, variationP[1 - m], variationAllN
+            )
+
+        return results, allpixels
 
-        results[0] = numregular
-        results[1] = numsingular
-        results[2] = numnegreg
-        results[3] = numnegsing
+    @staticmethod
+    def __flipGroups(
+        groups: np.ndarray, mask: np.ndarray, table: np.ndarray
+    ) -> np.ndarray:
+        flipped = groups.copy()
+        flipped[:, mask] = table[groups[:, mask]]
+        return flipped
 
-        return results
+    @staticmethod
+    def __countGroups(
+        counts: list[float],
+        variationB: np.ndarray,
+        variationP: np.ndarray,
+        variationN: np.ndarray,
+    ):
+        counts[0] += int(np.count_nonzero(variationP > variationB))
+        counts[1] += int(np.count_nonzero(variationP < variationB))
+        counts[2] += int(np.count_nonzero(variationN > variationB))
+        counts[3] += int(np.count_nonzero(variationN < variationB))
 
     @staticmethod
     def getResultNames() -> tuple[str, ...]:
@@ -436,99 +384,26 @@ class RSAnalysis:
             "Estimated message length (in bytes)",
         )
 
-    def __getVariation(self, block: list[int], color: int) -> float:
-        var: float = 0
-        color1: int
-        color2: int
-        for i in range(0, len(block), 4):
-            color1 = self.__getPixelColor(block[0 + i], color)
-            color2 = self.__getPixelColor(block[1 + i], color)
-            var += np.abs(color1 - color2)
-            color1 = self.__getPixelColor(block[3 + i], color)
-            color2 = self.__getPixelColor(block[2 + i], color)
-            var += np.abs(color1 - color2)
-            color1 = self.__getPixelColor(block[1 + i], color)
-            color2 = self.__getPixelColor(block[3 + i], color)
-            var += np.abs(color1 - color2)
-            color1 = self.__getPixelColor(block[2 + i], color)
-            color2 = self.__getPixelColor(block[0 + i], color)
-            var += np.abs(color1 - color2)
-        return var
-
-    def __getNegativeVariation(
-        self, block: list[int], color: int, mask: list[int]
-    ) -> float:
-        var: float = 0
-        color1: int
-        color2: int
-        for i in range(0, len(block), 4):
-            color1 = self.__getPixelColor(block[0 + i], color)
-            color2 = self.__getPixelColor(block[1 + i], color)
-            if mask[0 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[1 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += np.abs(color1 - color2)
-
-            color1 = self.__getPixelColor(block[1 + i], color)
-            color2 = self.__getPixelColor(block[3 + i], color)
-            if mask[1 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[3 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += np.abs(color1 - color2)
-
-            color1 = self.__getPixelColor(block[3 + i], color)
-            color2 = self.__getPixelColor(block[2 + i], color)
-            if mask[3 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[2 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += np.abs(color1 - color2)
-
-            color1 = self.__getPixelColor(block[2 + i], color)
-            color2 = self.__getPixelColor(block[0 + i], color)
-            if mask[2 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[0 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += np.abs(color1 - color2)
-        return var
-
-    def __getPixelColor(self, pixel: int, color: int) -> int:
-        return pixel
-
-    def __flipBlock(self, block: list[int], mask: list[int]) -> list[int]:
-        for i in range(len(block)):
-            if mask[i] == 1:
-                block[i] = self.__negateLSB(block[i])
-            elif mask[i] == -1:
-                block[i] = self.__invertLSB(block[i])
-        return block
-
-    def __negateLSB(self, abyte: int) -> int:
-        temp = abyte & 0xFE
-        if temp == abyte:
-            return abyte | 0x1
-        else:
-            return temp
-
-    def __invertLSB(self, abyte: int) -> int:
-        if abyte == 255:
-            return 256
-        if abyte == 256:
-            return 255
-        return self.__negateLSB(abyte + 1) - 1
-
-    def __invertMask(self, mask: list[int]) -> list[int]:
-        return [x * -1 for x in mask]
+    def __getVariation(self, groups: np.ndarray) -> np.ndarray:
+        chunks = groups.reshape(groups.shape[0], groups.shape[1] // 4, 4)
+        c0, c1, c2, c3 = (chunks[:, :, index] for index in range(4))
+        var = np.abs(c0 - c1) + np.abs(c3 - c2) + np.abs(c1 - c3) + np.abs(c2 - c0)
+        return var.sum(axis=1)
 
 
 class AUMP:
+    __dump_index = itertools.count()
+
     @staticmethod
-    def analyze(image: Image.Image, block_size: int, parameters: int) -> bool:
+    def analyze(
+        image: Image.Image,
+        block_size: int,
+        parameters: int,
+        dump_dir: str | None = None,
+    ) -> bool:
         pixels = np.array(image, dtype=np.floating)
-        scipy.io.savemat("array.mat", {"X": pixels})
+        if dump_dir is not None:
+            AUMP.__dump(image, pixels, dump_dir)
         try:
             a = AUMP.__aump(pixels, block_size, parameters)
             print(a)
@@ -536,6 +411,15 @@ class AUMP:
         except BaseException:
             return True
 
+    @staticmethod
+    def __dump(image: Image.Image, pixels, dump_dir: str):
+        # one file per image and worker process, workers never share a path
+        stem = pathlib.Path(getattr(image, "filename", "") or "image").stem
+        index = next(AUMP.__dump_index)
+        path = pathlib.Path(dump_dir) / f"{stem}_{os.getpid()}_{index}.mat"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        scipy.io.savemat(path, {"X": pixels})
+
     @staticmethod
     def __aump(X, m, d):
         Xpred, _, w = AUMP.__pred_aump(X, m, d)
@@ -1,15 +1,27 @@
 import PIL.Image
 import numpy
-import scipy
+import scipy.io
+
+import functools
+import itertools
+import os
+import pathlib
 
 
 class AUMPAnalysis:
     __WALL = 1
+    __dump_index = itertools.count()
 
     @staticmethod
-    def analyze(image: PIL.Image.Image, block_size: int, parameters: int) -> bool:
+    def analyze(
+        image: PIL.Image.Image,
+        block_size: int,
+        parameters: int,
+        dump_dir: str | None = None,
+    ) -> bool:
         pixels = numpy.array(image, dtype=numpy.floating)
-        scipy.io.savemat("array.mat", {"X": pixels})
+        if dump_dir is not None:
+            AUMPAnalysis.__dump(image, pixels, dump_dir)
         try:
             return (
                 AUMPAnalysis.__aump(pixels, block_size, parameters)
@@ -18,45 +30,66 @@ class AUMPAnalysis:
         except BaseException:
             return False
 
+    @staticmethod
+    def analyze_batch(images, block_size: int, parameters: int) -> list[bool]:
+        # same sized images, either as a list or already stacked into 3-D
+        pixels = numpy.array(images, dtype=numpy.floating)
+        try:
+            betas = AUMPAnalysis.__aump(pixels, block_size, parameters)
+        except BaseException:
+            return [False] * len(pixels)
+        return (betas > AUMPAnalysis.__WALL).tolist()
+
+    @staticmethod
+    def __dump(image: PIL.Image.Image, pixels, dump_dir: str):
+        # one file per image and worker process, workers never share a path
+        stem = pathlib.Path(getattr(image, "filename", "") or "image").stem
+        index = next(AUMPAnalysis.__dump_index)
+        path = pathlib.Path(dump_dir) / f"{stem}_{os.getpid()}_{index}.mat"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        scipy.io.savemat(path, {"X": pixels})
+
     @staticmethod
     def __aump(X, m, d):
+        X = AUMPAnalysis.__blocks(X, m)
         Xpred, _, w = AUMPAnalysis.__pred_aump(X, m, d)
-        r = X - Xpred
-        Xbar = X + 1 - 2 * (X % 2)
-        beta = numpy.sum(w * (X - Xbar) * r)
+        r = numpy.subtract(X, Xpred, out=Xpred)
+        # X - Xbar is 1 for odd pixels and -1 for even ones
+        numpy.negative(r, out=r, where=X % 2 == 0)
+        beta = numpy.sum(w[..., 0] * r.sum(axis=-1), axis=(-2, -1))
         return beta
 
     @staticmethod
-    def __pred_aump(X, m, d):
-        sig_th = 1
-        q = d + 1
-        Kn = X.size // m
-        Y = numpy.zeros((m, Kn))
-        S = numpy.zeros_like(X)
-        Xpred = numpy.zeros_like(X)
+    def __blocks(X, m):
+        # rows split into blocks of m adjacent pixels along a new last axis,
+        # trailing columns that do not fill a whole block are left out
+        width = X.shape[-1] - X.shape[-1] % m
+        return X[..., :width].reshape(X.shape[:-1] + (width // m, m))
 
+    @staticmethod
+    @functools.cache
+    def __projection(m, d):
+        # polynomial fit of a block depends on m and d only: Ypred = H pinv(H) Y
         x1 = numpy.linspace(1, m, m) / m
-        H = numpy.vander(x1, q, increasing=True)
-
-        for i in range(m):
-            aux = X[:, i::m]
-            Y[i, :] = aux.flatten()
+        H = numpy.vander(x1, d + 1, increasing=True)
+        return H @ numpy.linalg.pinv(H)
 
-        p = numpy.linalg.lstsq(H, Y, rcond=None)[0]
-        Ypred = H @ p
+    @staticmethod
+    def __pred_aump(X, m, d):
+        sig_th = 1
+        q = d + 1
+        Kn = X.shape[-3] * X.shape[-2]
 
-        for i in range(m):
-            Xpred[:, i::m] = Ypred[i, :].reshape(X[:, i::m].shape)
+        Xpred = X @ AUMPAnalysis.__projection(m, d).T
 
-        sig2 = numpy.sum((Y - Ypred) ** 2, axis=0) / (m - q)
+        r = X - Xpred
+        sig2 = numpy.einsum("...i,...i->...", r, r) / (m - q)
         sig2 = numpy.maximum(sig_th**2, sig2)
+        del r
 
-        Sy = numpy.ones((m, 1)) * sig2
-
-        for i in range(m):
-            S[:, i::m] = Sy[i, :].reshape(X[:, i::m].shape)
+        S = sig2[..., None]
 
-        s_n2 = Kn / numpy.sum(1.0 / sig2)
-        w = numpy.sqrt(s_n2 / (Kn * (m - q))) / S
+        s_n2 = Kn / numpy.sum(1.0 / sig2, axis=(-2, -1))
+        w = numpy.sqrt(s_n2 / (Kn * (m - q)))[..., None, None, None] / S
 
         return Xpred, S, w
@@ -5,91 +5,159 @@ import numpy
 
 class ChiSquaredAnalysis:
     __MIN_BIN = 5
+    __MIN_EXPECTED = 5
+    __MIN_PREFIX = 0.05
     __WALL = 0.5
 
     @staticmethod
     def analyze(image: PIL.Image.Image, block_size: int = 128) -> bool:
-        pixels = image.load()
-        if pixels is None:
-            raise BaseException
+        counts = ChiSquaredAnalysis.__block_counts(image, block_size)
         outs = []
 
-        for x_max in range(0, image.width, block_size):
-            for y_max in range(0, image.height, block_size):
-                x_min = min(0, x_max - block_size)
-                y_min = min(0, y_max - block_size)
-
-                distribution_actual: list[int] = [0] * 8
-                for x in range(x_min, x_max):
-                    for y in range(y_min, y_max):
-                        distribution_actual[pixels[x, y] & 0b111] += 1
-
-                distribution_mean: list[int] = [0] * len(distribution_actual)
-                for index in range(0, len(distribution_actual) - 1, 2):
-                    mean = (
-                        distribution_actual[index] + distribution_actual[index + 1]
-                    ) / 2
-                    if mean.is_integer():
-                        distribution_mean[index] = distribution_mean[index + 1] = int(
-                            mean
-                        )
-                    elif distribution_actual[index] < distribution_actual[index + 1]:
-                        distribution_mean[index] = int(mean)
-                        distribution_mean[index + 1] = int(mean) + 1
+        # pair-of-values expectation: each pair shares its total, the odd
+        # remainder goes to the more populated value of the pair
+        pair_sums = counts[:, 0::2] + counts[:, 1::2]
+        first_smaller = counts[:, 0::2] < counts[:, 1::2]
+        expected = numpy.empty_like(counts)
+        expected[:, 0::2] = numpy.where(
+            first_smaller, pair_sums // 2, pair_sums - pair_sums // 2
+        )
+        expected[:, 1::2] = pair_sums - expected[:, 0::2]
+
+        for distribution_actual, distribution_mean in zip(
+            counts.tolist(), expected.tolist()
+        ):
+            # print(distribution_actual)
+            # print(distribution_mean)
+            # combine bins
+            index = 0
+            ChiSquaredAnalysis.__MIN_BIN = numpy.average(distribution_actual)
+            while index < len(distribution_actual):
+                if distribution_actual[index] < ChiSquaredAnalysis.__MIN_BIN:
+                    val_sum = distribution_actual[index]
+                    stop = index
+                    for jindex in range(index + 1, len(distribution_actual)):
+                        val_sum += distribution_actual[jindex]
+                        if val_sum >= ChiSquaredAnalysis.__MIN_BIN:
+                            stop = jindex
+                            break
                     else:
-                        distribution_mean[index] = int(mean) + 1
-                        distribution_mean[index + 1] = int(mean)
-
-                # print(distribution_actual)
-                # print(distribution_mean)
-                # combine bins
-                index = 0
-                ChiSquaredAnalysis.__MIN_BIN = numpy.average(distribution_actual)
-                while index < len(distribution_actual):
-                    if distribution_actual[index] < ChiSquaredAnalysis.__MIN_BIN:
-                        val_sum = distribution_actual[index]
-                        stop = index
-                        for jindex in range(index + 1, len(distribution_actual)):
-                            val_sum += distribution_actual[jindex]
-                            if val_sum >= ChiSquaredAnalysis.__MIN_BIN:
-                                stop = jindex
-                                break
-                        else:
-                            stop = len(distribution_actual) - 1
-
-                        distribution_actual[index : stop + 1] = [
-                            sum(distribution_actual[index : stop + 1])
-                        ]
-                        distribution_mean[index : stop + 1] = [
-                            sum(distribution_mean[index : stop + 1])
-                        ]
-
-                    index += 1
-                if distribution_actual[-1] < ChiSquaredAnalysis.__MIN_BIN:
-                    distribution_actual[-2:] = [sum(distribution_actual[-2:])]
-                    distribution_mean[-2:] = [sum(distribution_mean[-2:])]
-                del index
-
-                for x in distribution_actual:
-                    if x == 0:
-                        break
-                else:
-                    if len(distribution_actual) == 2:
-                        if distribution_actual[0] == 0 or distribution_actual[1] == 0:
-                            outs.append(1)
-                            continue
-
-                    if len(distribution_actual) == 1:
+                        stop = len(distribution_actual) - 1
+
+                    distribution_actual[index : stop + 1] = [
+                        sum(distribution_actual[index : stop + 1])
+                    ]
+                    distribution_mean[index : stop + 1] = [
+                        sum(distribution_mean[index : stop + 1])
+                    ]
+
+                index += 1
+            if distribution_actual[-1] < ChiSquaredAnalysis.__MIN_BIN:
+                distribution_actual[-2:] = [sum(distribution_actual[-2:])]
+                distribution_mean[-2:] = [sum(distribution_mean[-2:])]
+            del index
+
+            for x in distribution_actual:
+                if x == 0:
+                    break
+            else:
+                if len(distribution_actual) == 2:
+                    if distribution_actual[0] == 0 or distribution_actual[1] == 0:
                         outs.append(1)
                         continue
 
-                    outs.append(
-                        scipy.stats.chisquare(
-                            f_obs=distribution_actual, f_exp=distribution_mean, ddof=1
-                        )[1]
-                    )
+                if len(distribution_actual) == 1:
+                    outs.append(1)
+                    continue
+
+                outs.append(
+                    scipy.stats.chisquare(
+                        f_obs=distribution_actual, f_exp=distribution_mean, ddof=1
+                    )[1]
+                )
         # print(outs)
         # print(numpy.average(outs))
         # outs = [x for x in outs if x > 0.000001]
         # return numpy.average(outs) > 0.5
         return numpy.average(outs) < ChiSquaredAnalysis.__WALL
+
+    @staticmethod
+    def analyze_sequential(image: PIL.Image.Image, chunk_size: int = 1024) -> bool:
+        # same contract as analyze: true while the pairs are not equalized,
+        # short high p-value prefixes are common in covers and are ignored
+        length = ChiSquaredAnalysis.estimate_length(image, chunk_size)
+        return length < image.width * image.height * ChiSquaredAnalysis.__MIN_PREFIX
+
+    @staticmethod
+    def estimate_length(image: PIL.Image.Image, chunk_size: int = 1024) -> int:
+        curve = ChiSquaredAnalysis.analyze_prefixes(image, chunk_size)
+        # embedded prefix keeps the pairs of values equalized, p drops right after
+        low = numpy.flatnonzero(curve < ChiSquaredAnalysis.__WALL)
+        chunks = low[0] if low.size else curve.size
+        return min(int(chunks) * chunk_size, image.width * image.height)
+
+    @staticmethod
+    def analyze_prefixes(
+        image: PIL.Image.Image, chunk_size: int = 1024
+    ) -> numpy.ndarray:
+        pixels = numpy.asarray(image)
+        if pixels.ndim != 2:
+            raise BaseException("only single channel images are supported")
+        # same column by column order the sequential embedders write in
+        values = pixels.T.ravel().astype(numpy.int64)
+
+        # histogram of every chunk, then running totals: one pass over pixels
+        chunk_ids = numpy.arange(values.size) // chunk_size
+        chunks = -(-values.size // chunk_size)
+        histograms = numpy.bincount(
+            chunk_ids * 256 + values, minlength=chunks * 256
+        ).reshape(chunks, 256)
+        histograms = histograms.cumsum(axis=0)
+
+        observed = histograms[:, 0::2]
+        expected = (observed + histograms[:, 1::2]) / 2
+        usable = expected >= ChiSquaredAnalysis.__MIN_EXPECTED
+        terms = numpy.zeros(expected.shape)
+        numpy.divide((observed - expected) ** 2, expected, out=terms, where=usable)
+        statistic = terms.sum(axis=1)
+        dof = usable.sum(axis=1) - 1
+
+        p_values = numpy.ones(chunks)
+        valid = dof > 0
+        p_values[valid] = scipy.stats.chi2.sf(statistic[valid], dof[valid])
+        return p_values
+
+    @staticmethod
+    def __block_counts(image: PIL.Image.Image, block_size: int) -> numpy.ndarray:
+        pixels = numpy.asarray(image)
+        if pixels.ndim != 2:
+            raise BaseException("only single channel images are supported")
+        classes = pixels & 0b111
+        height, width = classes.shape
+        blocks_y = -(-height // block_size)
+        blocks_x = -(-width // block_size)
+
+        tile_y = numpy.arange(height) // block_size
+        tile_x = numpy.arange(width) // block_size
+        tile_ids = tile_y[:, None] * blocks_x + tile_x[None, :]
+        tiles = numpy.bincount(
+            (tile_ids * 8 + classes).ravel(), minlength=blocks_y * blocks_x * 8
+        ).reshape(blocks_y, blocks_x, 8)
+
+        # the region of block (x_max, y_max) spans [0, x_max) x [0, y_max),
+        # a zero bound starts it at -block_size, i.e. at the far image edge
+        prefix = tiles.cumsum(axis=0).cumsum(axis=1)
+        right = numpy.zeros((blocks_y, 8), dtype=tiles.dtype)
+        numpy.add.at(right, (tile_y[:, None], classes[:, -block_size:]), 1)
+        bottom = numpy.zeros((blocks_x, 8), dtype=tiles.dtype)
+        numpy.add.at(bottom, (tile_x[None, :], classes[-block_size:, :]), 1)
+        corner = numpy.bincount(
+            classes[-block_size:, -block_size:].ravel(), minlength=8
+        )
+
+        counts = numpy.empty((blocks_x, blocks_y, 8), dtype=tiles.dtype)
+        counts[0, 0] = corner
+        counts[0, 1:] = right.cumsum(axis=0)[:-1]
+        counts[1:, 0] = bottom.cumsum(axis=0)[:-1]
+        counts[1:, 1:] = prefix[:-1, :-1].transpose(1, 0, 2)
+        return counts.reshape(-1, 8)
@@ -1,154 +1,112 @@
 import PIL.Image
 from bitarray import bitarray
+import numpy
 
 
 class LSBMessage:
+    # Flag bit for each window: clp -> bit 2, cmp -> bit 1, crp -> bit 0
+    __FLAG_WEIGHTS = numpy.array([4, 2, 1], dtype=numpy.uint8)
+
+    @staticmethod
+    def __columns(img_in: PIL.Image.Image) -> tuple[numpy.ndarray, numpy.ndarray]:
+        # Fortran order makes the flat view walk x then y, like pixels[x, y]
+        pixels = numpy.array(img_in, dtype=numpy.uint8, order="F")
+        return pixels, pixels.reshape(-1, order="F")
+
+    @staticmethod
+    def __windows(flat: numpy.ndarray) -> numpy.ndarray:
+        # Slot stream clp, cmp, crp of pixel 0, then of pixel 1, ...
+        return numpy.stack(
+            (flat >> 6, (flat >> 5) & 0b11, (flat >> 4) & 0b11), axis=1
+        ).ravel()
+
+    @staticmethod
+    def __symbols(message_bits: bitarray) -> numpy.ndarray:
+        bits = numpy.frombuffer(message_bits.unpack(), dtype=numpy.uint8)
+        symbols_len = len(bits) // 2
+        return (bits[0 : 2 * symbols_len : 2] << 1) | bits[1 : 2 * symbols_len : 2]
+
+    @staticmethod
+    def __match_slots(windows: numpy.ndarray, symbols: numpy.ndarray) -> list[int]:
+        # Each symbol takes the first slot at or after the current one with an
+        # equal window; every slot skipped on the way gets a cleared flag
+        slots = windows.tobytes()
+        positions = []
+        position = 0
+        for symbol in symbols.tobytes():
+            position = slots.find(symbol, position)
+            if position < 0:
+                break
+            positions.append(position)
+            position += 1
+        return positions
+
+    @staticmethod
+    def __write_flags(
+        pixels: numpy.ndarray,
+        flat: numpy.ndarray,
+        positions: list[int],
+        symbols_len: int,
+    ) -> PIL.Image.Image:
+        # Matching is greedy, so the first symbols_len positions of a longer
+        # message are the positions of its prefix
+        positions = positions[:symbols_len]
+
+        # Pixels are rewritten up to the one holding the last symbol,
+        # or all of them if the message did not fit
+        if len(positions) == symbols_len:
+            touched = positions[-1] // 3 + 1 if positions else 0
+        else:
+            touched = flat.size
+
+        flags = numpy.zeros(flat.size * 3, dtype=numpy.uint8)
+        flags[positions] = 1
+        flags = flags[: touched * 3].reshape(-1, 3) @ LSBMessage.__FLAG_WEIGHTS
+        flat[:touched] = (flat[:touched] & ~numpy.uint8(0b111)) | flags
+
+        return PIL.Image.fromarray(pixels)
+
     @staticmethod
     def inject_message(
         img_in: PIL.Image.Image, message_bits: bitarray
     ) -> PIL.Image.Image:
-        img = img_in.copy()
-        pixels_in = img_in.load()
-        pixels = img.load()
-        if pixels_in is None or pixels is None:
-            raise BaseException("pixels_in is None")
-
-        msg_index = 0
-
-        def index_in():
-            return msg_index < len(message_bits) - 1
-
-        def mi():
-            try:
-                return (message_bits[msg_index] << 1) | message_bits[msg_index + 1]
-            except BaseException:
-                return 0b100
-
-        for x in range(img.size[0]):
-            for y in range(img.size[1]):
-                if not index_in():
-                    break
-
-                byte = pixels_in[x, y]
-                clp = (byte & 0b11000000) >> 6
-                cmp = (byte & 0b01100000) >> 5
-                crp = (byte & 0b00110000) >> 4
-
-                if mi() == clp:
-                    byte |= 1 << 2
-                    msg_index += 2
-                else:
-                    byte &= ~(1 << 2)
-                if mi() == cmp:
-                    byte |= 1 << 1
-                    msg_index += 2
-                else:
-                    byte &= ~(1 << 1)
-                if mi() == crp:
-                    byte |= 1
-                    msg_index += 2
-                else:
-                    byte &= ~(1)
-
-                pixels[x, y] = byte
-            else:
-                continue
-            break
-
-        return img
+        pixels, flat = LSBMessage.__columns(img_in)
+        symbols = LSBMessage.__symbols(message_bits)
+        positions = LSBMessage.__match_slots(LSBMessage.__windows(flat), symbols)
+        return LSBMessage.__write_flags(pixels, flat, positions, len(symbols))
+
+    @staticmethod
+    def inject_message_share(
+        img_in: PIL.Image.Image, message_bits: bitarray, percent: int
+    ) -> tuple[PIL.Image.Image, int]:
+        # Same as get_max_capacity followed by inject_message of the first
+        # capacity * percent // 100 bits, with a single matching pass
+        pixels, flat = LSBMessage.__columns(img_in)
+        symbols = LSBMessage.__symbols(message_bits)
+        positions = LSBMessage.__match_slots(LSBMessage.__windows(flat), symbols)
+
+        capacity = len(positions) * 2
+        share_len = capacity * percent // 100
+        img = LSBMessage.__write_flags(pixels, flat, positions, share_len // 2)
+        return img, capacity
 
     @staticmethod
     def extract_message(img_in: PIL.Image.Image, message_bit_len: int) -> bitarray:
-        pixels_in = img_in.load()
-        msg_index = 0
-        message_bits = []
-        if pixels_in is None:
-            raise BaseException("pixels_in is None")
-
-        for x in range(img_in.size[0]):
-            for y in range(img_in.size[1]):
-                if msg_index >= message_bit_len:
-                    break
-
-                byte = pixels_in[x, y]
-
-                # Извлекаем старшие биты (по 2 бита каждый)
-                clp = (byte & 0b11000000) >> 6
-                cmp = (byte & 0b01100000) >> 5
-                crp = (byte & 0b00110000) >> 4
-
-                # Извлекаем флаги (младшие 3 бита)
-                clp_flag = (byte >> 2) & 1
-                cmp_flag = (byte >> 1) & 1
-                crp_flag = byte & 1
-
-                # Если флаг установлен — значит соответствующий старший блок был частью сообщения
-                if clp_flag and msg_index + 2 <= message_bit_len:
-                    message_bits.extend([(clp >> 1) & 1, clp & 1])
-                    msg_index += 2
-                if cmp_flag and msg_index + 2 <= message_bit_len:
-                    message_bits.extend([(cmp >> 1) & 1, cmp & 1])
-                    msg_index += 2
-                if crp_flag and msg_index + 2 <= message_bit_len:
-                    message_bits.extend([(crp >> 1) & 1, crp & 1])
-                    msg_index += 2
-
-                if msg_index >= message_bit_len:
-                    break
-            else:
-                continue
-            break
-
-        return bitarray(message_bits)
+        _, flat = LSBMessage.__columns(img_in)
+        windows = LSBMessage.__windows(flat)
+
+        # Flags in the three least significant bits mark the windows that were
+        # part of the message
+        flags = numpy.unpackbits(flat[:, None], axis=1)[:, 5:].ravel()
+        symbols = windows[flags.astype(bool)][: message_bit_len // 2]
+        bits = numpy.unpackbits(symbols[:, None], axis=1)[:, 6:].ravel()
+
+        message = bitarray()
+        message.pack(bits.tobytes())
+        return message
 
     @staticmethod
-    def get_max_capacity(img_in: PIL.Image.Image, message_bits: bitarray):
-        img = img_in.copy()
-        pixels_in = img_in.load()
-        pixels = img.load()
-        if pixels_in is None or pixels is None:
-            raise BaseException("pixels_in is None")
-
-        msg_index = 0
-
-        def index_in():
-            return msg_index < len(message_bits) - 1
-
-        def mi():
-            try:
-                return (message_bits[msg_index] << 1) | message_bits[msg_index + 1]
-            except BaseException:
-                return 0b100
-
-        for x in range(img.size[0]):
-            for y in range(img.size[1]):
-                if not index_in():
-                    break
-
-                byte = pixels_in[x, y]
-                clp = (byte & 0b11000000) >> 6
-                cmp = (byte & 0b01100000) >> 5
-                crp = (byte & 0b00110000) >> 4
-
-                if mi() == clp:
-                    byte |= 1 << 2
-                    msg_index += 2
-                else:
-                    byte &= ~(1 << 2)
-                if mi() == cmp:
-                    byte |= 1 << 1
-                    msg_index += 2
-                else:
-                    byte &= ~(1 << 1)
-                if mi() == crp:
-                    byte |= 1
-                    msg_index += 2
-                else:
-                    byte &= ~(1)
-
-                pixels[x, y] = byte
-            else:
-                continue
-            break
-
-        return msg_index
+    def get_max_capacity(img_in: PIL.Image.Image, message_bits: bitarray) -> int:
+        _, flat = LSBMessage.__columns(img_in)
+        symbols = LSBMessage.__symbols(message_bits)
+        return len(LSBMessage.__match_slots(LSBMessage.__windows(flat), symbols)) * 2
@@ -2,224 +2,204 @@ import PIL.Image
 from bitarray import bitarray
 import numpy
 
+import concurrent.futures
+
 SCALE_COEF = 2
 
 
 class LSBScaledMessage:
     @staticmethod
     def scale_image(img_in: PIL.Image.Image) -> PIL.Image.Image:
-        img_out = PIL.Image.new("L", (img_in.size[0] * 2, img_in.size[1] * 2))
-
-        pixels_in = img_in.load()
-        pixels_out = img_out.load()
-
-        if pixels_in is None or pixels_out is None:
-            raise BaseException("pixel arrays are none")
-
-        BLOCKS = img_in.size[0]
-
-        for m in range(BLOCKS - 1):
-            for n in range(BLOCKS - 1):
-                x = m * SCALE_COEF
-                y = n * SCALE_COEF
-                pixels_out[x, y] = pixels_in[m, n]
-                pixels_out[x + 1, y] = (
-                    pixels_in[m, n] + pixels_in[m + 1, n]
-                ) // SCALE_COEF
-                pixels_out[x, y + 1] = (
-                    pixels_in[m, n] + pixels_in[m, n + 1]
-                ) // SCALE_COEF
-                pixels_out[x + 1, y + 1] = (
-                    SCALE_COEF * pixels_in[m, n]
-                    + (pixels_in[m + 1, n] + pixels_in[m, n + 1]) // SCALE_COEF
-                ) // (SCALE_COEF + 1)
-
-        # Fill bottom border
-        for m in range(BLOCKS):
-            n = BLOCKS - 1
-            for x in range(m * SCALE_COEF, (m + 1) * SCALE_COEF):
-                for y in range(n * SCALE_COEF, (n + 1) * SCALE_COEF):
-                    pixels_out[x, y] = pixels_in[m, n]
-
-        # Fill right border
-        for n in range(BLOCKS):
-            m = BLOCKS - 1
-            for x in range(m * SCALE_COEF, (m + 1) * SCALE_COEF):
-                for y in range(n * SCALE_COEF, (n + 1) * SCALE_COEF):
-                    pixels_out[x, y] = pixels_in[m, n]
-
-        return img_out
+        pixels_in = numpy.asarray(img_in, dtype=numpy.int32)
+        height, width = pixels_in.shape
+
+        # Bottom and right border blocks repeat their source pixel, so start
+        # from a nearest-neighbour upscale and overwrite the inner blocks
+        pixels_out = pixels_in.repeat(SCALE_COEF, axis=0).repeat(SCALE_COEF, axis=1)
+
+        center = pixels_in[:-1, :-1]
+        right = pixels_in[:-1, 1:]
+        below = pixels_in[1:, :-1]
+        rows = (height - 1) * SCALE_COEF
+        cols = (width - 1) * SCALE_COEF
+
+        pixels_out[1:rows:SCALE_COEF, 0:cols:SCALE_COEF] = (
+            center + below
+        ) // SCALE_COEF
+        pixels_out[0:rows:SCALE_COEF, 1:cols:SCALE_COEF] = (
+            center + right
+        ) // SCALE_COEF
+        pixels_out[1:rows:SCALE_COEF, 1:cols:SCALE_COEF] = (
+            SCALE_COEF * center + (right + below) // SCALE_COEF
+        ) // (SCALE_COEF + 1)
+
+        return PIL.Image.fromarray(pixels_out.astype(numpy.uint8))
+
+    @staticmethod
+    def __blocks(pixels: numpy.ndarray, border: int) -> numpy.ndarray:
+        # View of the 2x2 blocks as (x block, y block, y_i, x_i): raveling it
+        # visits blocks x-first and pixels inside a block row by row
+        height, width = pixels.shape
+        blocks_x = len(range(0, width - border, SCALE_COEF))
+        blocks_y = len(range(0, height - border, SCALE_COEF))
+        region = pixels[: blocks_y * SCALE_COEF, : blocks_x * SCALE_COEF]
+        return region.reshape(blocks_y, SCALE_COEF, blocks_x, SCALE_COEF).transpose(
+            2, 0, 1, 3
+        )
+
+    @staticmethod
+    def __bit_counts(values: numpy.ndarray, base: numpy.ndarray) -> numpy.ndarray:
+        return numpy.log2(numpy.maximum(numpy.abs(values - base), 1)).astype(
+            numpy.uint8
+        )
+
+    @staticmethod
+    def __used_slots(ends: numpy.ndarray, message_bit_len: int) -> int:
+        # Slots are filled up to the first one where the message runs out
+        return min(int(numpy.searchsorted(ends, message_bit_len)) + 1, len(ends))
+
+    @staticmethod
+    def __run_bands(task, blocks_x: int, band_size: int, used: int, workers: int):
+        # Bands of x blocks are contiguous runs of slots, so each one knows its
+        # message offset from the prefix sum; bands past the message are skipped
+        bounds = numpy.linspace(0, blocks_x, max(workers, 1) + 1).astype(int)
+        bands = [
+            (int(begin), int(end))
+            for begin, end in zip(bounds[:-1], bounds[1:])
+            if begin < end and begin * band_size < used
+        ]
+        if workers <= 1 or len(bands) <= 1:
+            return [task(*band) for band in bands]
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            return list(pool.map(lambda band: task(*band), bands))
+
+    @staticmethod
+    def __pack_values(
+        bits: numpy.ndarray, counts: numpy.ndarray, ends: numpy.ndarray
+    ) -> numpy.ndarray:
+        # Read each pixel's bits most significant first; the last one may
+        # get fewer bits than it can hold
+        values = numpy.zeros(counts.size, dtype=numpy.uint8)
+        if not len(bits):
+            return values
+        starts = ends - counts
+        stops = numpy.minimum(ends, len(bits))
+        for offset in range(int(counts.max(initial=0))):
+            positions = starts + offset
+            take = (positions < stops).view(numpy.uint8)
+            bit = bits[numpy.minimum(positions, len(bits) - 1)]
+            values = (values << take) | (bit & take)
+        return values
+
+    @staticmethod
+    def __unpack_fields(
+        values: numpy.ndarray, counts: numpy.ndarray, skip_last: int
+    ) -> numpy.ndarray:
+        # Each value is a field of counts bits, right-aligned in its byte
+        fields = numpy.unpackbits(values.astype(numpy.uint8)[:, None], axis=1)
+        first = 8 - counts.astype(numpy.int64)
+
+        # The last pixel keeps only the low bits that are still missing
+        if first.size:
+            first[-1] += skip_last
+
+        return fields[numpy.arange(8) >= first[:, None]]
+
+    @staticmethod
+    def capacity_map(img_in: PIL.Image.Image) -> numpy.ndarray:
+        pixels = numpy.asarray(img_in, dtype=numpy.int32)
+        capacity = numpy.zeros(pixels.shape, dtype=numpy.uint8)
+        blocks = LSBScaledMessage.__blocks(pixels, SCALE_COEF * 2)
+        LSBScaledMessage.__blocks(capacity, SCALE_COEF * 2)[...] = (
+            LSBScaledMessage.__bit_counts(blocks, blocks[:, :, :1, :1])
+        )
+        return capacity
 
     @staticmethod
     def inject_message(
-        img_in: PIL.Image.Image, message_bits: bitarray
+        img_in: PIL.Image.Image, message_bits: bitarray, workers: int = 1
     ) -> PIL.Image.Image:
-        img_out = img_in.copy()
-        pixels_in = img_in.load()
-        pixels_out = img_out.load()
-
-        if pixels_in is None or pixels_out is None:
-            raise BaseException("pixel arrays are none")
-
-        # positions = []
-
-        message_bits_index = 0
-        # Going by blocks
-        for x in range(0, img_out.size[0] - SCALE_COEF * 2, SCALE_COEF):
-            for y in range(0, img_out.size[1] - SCALE_COEF * 2, SCALE_COEF):
-                bit_counts = tuple(
-                    int(
-                        numpy.log2(
-                            max(
-                                numpy.abs(
-                                    pixels_out[x + x_i, y + y_i] - pixels_out[x, y]
-                                ),
-                                1,
-                            )
-                        )
-                    )
-                    for y_i in range(SCALE_COEF)
-                    for x_i in range(SCALE_COEF)
-                )
-                for y_i in range(SCALE_COEF):
-                    for x_i in range(SCALE_COEF):
-                        message_bits_next_index = (
-                            message_bits_index + bit_counts[x_i + y_i * SCALE_COEF]
-                        )
-                        val = sum(
-                            el << index
-                            for index, el in enumerate(
-                                reversed(
-                                    message_bits[
-                                        message_bits_index:message_bits_next_index
-                                    ]
-                                )
-                            )
-                        )
-                        # if bit_counts[x_i + y_i * SCALE_COEF] > 0:
-                        #     positions.append(tuple([x + x_i, y + y_i, val]))
-                        pixels_out[x + x_i, y + y_i] += val
-
-                        if message_bits_next_index >= len(message_bits):
-                            break
-                        message_bits_index = message_bits_next_index
-                    # broke a leg, falling down the stairs
-                    else:
-                        continue
-                    break
-                else:
-                    continue
-                break
-            else:
-                continue
-            break
-
-        # print(positions)
-        return img_out
+        pixels = numpy.array(img_in, dtype=numpy.int32)
+        blocks = LSBScaledMessage.__blocks(pixels, SCALE_COEF * 2)
+        counts = LSBScaledMessage.__blocks(
+            LSBScaledMessage.capacity_map(img_in), SCALE_COEF * 2
+        ).ravel()
+        bits = numpy.frombuffer(message_bits.unpack(), dtype=numpy.uint8)
+
+        # Prefix sum of the counts gives every pixel its message offset
+        ends = numpy.cumsum(counts, dtype=numpy.int64)
+        used = LSBScaledMessage.__used_slots(ends, len(bits))
+        band_size = blocks.shape[1] * SCALE_COEF**2
+
+        def inject_band(x_begin: int, x_end: int):
+            band = blocks[x_begin:x_end]
+            begin = x_begin * band_size
+            end = min(x_end * band_size, used)
+            values = numpy.zeros(band.size, dtype=numpy.int32)
+            values[: end - begin] = LSBScaledMessage.__pack_values(
+                bits, counts[begin:end], ends[begin:end]
+            )
+            band += values.reshape(band.shape)
+
+        LSBScaledMessage.__run_bands(
+            inject_band, blocks.shape[0], band_size, used, workers
+        )
+        return PIL.Image.fromarray(numpy.clip(pixels, 0, 255).astype(numpy.uint8))
 
     @staticmethod
-    def extract_message(img_in: PIL.Image.Image, message_bit_len: int) -> bitarray:
-        pixels_in = img_in.load()
-        if pixels_in is None:
-            raise BaseException("pixels array is none")
-        message_bits: list[int] = []
-        # positions = []
-
-        for x in range(0, img_in.size[0] - SCALE_COEF * 2, SCALE_COEF):
-            for y in range(0, img_in.size[1] - SCALE_COEF * 2, SCALE_COEF):
-                vals = (
-                    0,
-                    pixels_in[x + 1, y]
-                    - (pixels_in[x, y] + pixels_in[x + SCALE_COEF, y]) // SCALE_COEF,
-                    pixels_in[x, y + 1]
-                    - (pixels_in[x, y] + pixels_in[x, y + SCALE_COEF]) // SCALE_COEF,
-                    pixels_in[x + 1, y + 1]
-                    - (
-                        SCALE_COEF * pixels_in[x, y]
-                        + (pixels_in[x + SCALE_COEF, y] + pixels_in[x, y + SCALE_COEF])
-                        // SCALE_COEF
-                    )
-                    // (SCALE_COEF + 1),
-                )
-                bit_counts = tuple(
-                    int(
-                        numpy.log2(
-                            max(
-                                numpy.abs(
-                                    pixels_in[x + x_i, y + y_i]
-                                    - vals[x_i + y_i * SCALE_COEF]
-                                    - pixels_in[x, y]
-                                ),
-                                1,
-                            )
-                        )
-                    )
-                    for y_i in range(SCALE_COEF)
-                    for x_i in range(SCALE_COEF)
-                )
-                vals = tuple(
-                    [int(i) for i in f"{val:0{bit_counts[index]}b}"]
-                    if bit_counts[index] > 0
-                    else []
-                    for index, val in enumerate(vals)
-                )
-                # for y_i in range(SCALE_COEF):
-                #     for x_i in range(SCALE_COEF):
-                #         if bit_counts[x_i + y_i * SCALE_COEF] > 0:
-                #             positions.append(
-                #                 tuple([x + x_i, y + y_i, vals[x_i + y_i * SCALE_COEF]])
-                #             )
-                for val in vals:
-                    message_bits += val
-                    # message_bits += (
-                    #     val[min(0, message_bit_len - len(message_bits)) :: -1]
-                    # )[::-1]
-                    if len(message_bits) >= message_bit_len:
-                        diff = len(message_bits) - message_bit_len
-                        # print(diff)
-                        # vals = [x for x in vals if len(x) > 0]
-                        message_bits = (
-                            message_bits[: len(message_bits) - len(val)]
-                            + val[::-1][: len(val) - diff][::-1]
-                        )
-                        # print(val)
-                        # print(val[::-1][: len(val) - diff :][::-1])
-                        break
-                    else:
-                        continue
-                    break
-                else:
-                    continue
-                break
-            else:
-                continue
-            break
-        # print(positions)
-
-        return bitarray(message_bits)
+    def extract_message(
+        img_in: PIL.Image.Image, message_bit_len: int, workers: int = 1
+    ) -> bitarray:
+        pixels = numpy.asarray(img_in, dtype=numpy.int32)
+        blocks = LSBScaledMessage.__blocks(pixels, SCALE_COEF * 2)
+        blocks_x, blocks_y = blocks.shape[:2]
+
+        # Restore the interpolated cover from the untouched block corners
+        corners = pixels[
+            : (blocks_y + 1) * SCALE_COEF : SCALE_COEF,
+            : (blocks_x + 1) * SCALE_COEF : SCALE_COEF,
+        ].T
+        center = corners[:-1, :-1]
+        right = corners[1:, :-1]
+        below = corners[:-1, 1:]
+        cover = numpy.empty(blocks.shape, dtype=numpy.int32)
+        cover[:, :, 0, 0] = center
+        cover[:, :, 0, 1] = (center + right) // SCALE_COEF
+        cover[:, :, 1, 0] = (center + below) // SCALE_COEF
+        cover[:, :, 1, 1] = (SCALE_COEF * center + (right + below) // SCALE_COEF) // (
+            SCALE_COEF + 1
+        )
+
+        values = (blocks - cover).ravel()
+        counts = LSBScaledMessage.__bit_counts(cover, center[:, :, None, None]).ravel()
+
+        ends = numpy.cumsum(counts, dtype=numpy.int64)
+        used = LSBScaledMessage.__used_slots(ends, message_bit_len)
+        skip_last = max(int(ends[used - 1]) - message_bit_len, 0) if used else 0
+        band_size = blocks_y * SCALE_COEF**2
+
+        def extract_band(x_begin: int, x_end: int) -> numpy.ndarray:
+            begin = x_begin * band_size
+            end = min(x_end * band_size, used)
+            return LSBScaledMessage.__unpack_fields(
+                values[begin:end], counts[begin:end], skip_last if end == used else 0
+            )
+
+        parts = LSBScaledMessage.__run_bands(
+            extract_band, blocks_x, band_size, used, workers
+        )
+
+        message = bitarray()
+        for part in parts:
+            message.pack(part.tobytes())
+        return message
 
     @staticmethod
     def get_max_capacity(img_in: PIL.Image.Image) -> int:
-        pixels_in = img_in.load()
-        if pixels_in is None:
-            raise BaseException("pixels_in is none")
-        capacity = 0
-        for x in range(0, img_in.size[0] - SCALE_COEF, SCALE_COEF):
-            for y in range(0, img_in.size[1] - SCALE_COEF, SCALE_COEF):
-                bit_counts = tuple(
-                    int(
-                        numpy.log2(
-                            max(
-                                numpy.abs(
-                                    pixels_in[x + x_i, y + y_i] - pixels_in[x, y]
-                                ),
-                                1,
-                            )
-                        )
-                    )
-                    for y_i in range(SCALE_COEF)
-                    for x_i in range(SCALE_COEF)
-                )
-                capacity += sum(bit_counts)
-
-        return capacity
+        pixels = numpy.asarray(img_in, dtype=numpy.int32)
+        blocks = LSBScaledMessage.__blocks(pixels, SCALE_COEF)
+        return int(
+            LSBScaledMessage.__bit_counts(blocks, blocks[:, :, :1, :1]).sum(
+                dtype=numpy.int64
+            )
+        )
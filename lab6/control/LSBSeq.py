@@ -1,50 +1,66 @@
 import PIL.Image
 from bitarray import bitarray
+import numpy
 
 
 class LSBSeq:
+    __SYMBOL_BITS = 3
+    __SYMBOL_MASK = numpy.uint8((1 << 3) - 1)
+
+    @staticmethod
+    def __columns(img_in: PIL.Image.Image) -> tuple[numpy.ndarray, numpy.ndarray]:
+        # Fortran order makes the flat view walk x then y, like pixels[x, y]
+        pixels = numpy.array(img_in, dtype=numpy.uint8, order="F")
+        return pixels, pixels.reshape(-1, order="F")
+
     @staticmethod
     def inject_message(img_in: PIL.Image.Image, message: bitarray) -> PIL.Image.Image:
-        img = img_in.copy()
-        pixels = img.load()
-        last_x = None
-        last_y = None
-        msg_index = 0
-        max_valid = len(message) - len(message) % 3
-        if pixels is None:
-            raise BaseException("pixels_in is None")
-        for x in range(img.width):
-            for y in range(img.height):
-                if msg_index >= max_valid:
-                    last_x = x
-                    last_y = y
-                    break
-                byte = pixels[x, y]
-
-                for index in range(3):
-                    if message[msg_index + index]:
-                        byte |= 1 << index
-                    else:
-                        byte &= ~(1 << index)
-
-                pixels[x, y] = byte
-
-                msg_index += 3
-            else:
-                continue
-            break
-
-        if last_x is not None and last_y is not None:
-            last_bits_len = len(message) % 3
-            byte = pixels[last_x, last_y]
-            for index in range(last_bits_len):
-                if message[-(last_bits_len - index)]:
-                    byte |= 1 << index
-                else:
-                    byte &= ~(1 << index)
-            pixels[last_x, last_y] = byte
-
-        return img
+        pixels, flat = LSBSeq.__columns(img_in)
+        bits = numpy.frombuffer(message.unpack(), dtype=numpy.uint8)
+
+        symbols_len = min(len(bits) // LSBSeq.__SYMBOL_BITS, flat.size)
+        symbols = numpy.packbits(
+            bits[: symbols_len * LSBSeq.__SYMBOL_BITS].reshape(
+                -1, LSBSeq.__SYMBOL_BITS
+            ),
+            axis=1,
+            bitorder="little",
+        ).ravel()
+        flat[:symbols_len] = (flat[:symbols_len] & ~LSBSeq.__SYMBOL_MASK) | symbols
+
+        # The remaining len % 3 bits go to the next pixel, if there is one
+        last_bits_len = len(bits) % LSBSeq.__SYMBOL_BITS
+        if last_bits_len and symbols_len < flat.size:
+            mask = numpy.uint8((1 << last_bits_len) - 1)
+            last = numpy.packbits(bits[-last_bits_len:], bitorder="little")[0]
+            flat[symbols_len] = (flat[symbols_len] & ~mask) | last
+
+        return PIL.Image.fromarray(pixels)
+
+    @staticmethod
+    def extract_message(img_in: PIL.Image.Image, message_bit_len: int) -> bitarray:
+        _, flat = LSBSeq.__columns(img_in)
+
+        symbols_len = min(message_bit_len // LSBSeq.__SYMBOL_BITS, flat.size)
+        bits = numpy.unpackbits(
+            flat[:symbols_len, None],
+            axis=1,
+            count=LSBSeq.__SYMBOL_BITS,
+            bitorder="little",
+        ).ravel()
+
+        last_bits_len = message_bit_len % LSBSeq.__SYMBOL_BITS
+        if last_bits_len and symbols_len < flat.size:
+            last = numpy.unpackbits(
+                flat[symbols_len : symbols_len + 1],
+                count=last_bits_len,
+                bitorder="little",
+            )
+            bits = numpy.concatenate((bits, last))
+
+        message = bitarray()
+        message.pack(bits.tobytes())
+        return message
 
     @staticmethod
     def get_max_capacity(img_in: PIL.Image.Image) -> int:
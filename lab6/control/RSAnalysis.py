@@ -8,19 +8,14 @@ class RSAnalysis:
     ANALYSIS_COLOR_GREEN = 1
     ANALYSIS_COLOR_BLUE = 2
 
+    # F1 and F-1 flipping functions tabulated for every byte value
+    __NEGATE_LSB = numpy.arange(256, dtype=numpy.int16) ^ 1
+    __INVERT_LSB = ((numpy.arange(256, dtype=numpy.int16) + 1) ^ 1) - 1
+
     def __init__(self, m: int, n: int):
-        self.__mMask = [[0] * (m * n), [0] * (m * n)]
-
-        k: int = 0
-        for i in range(n):
-            for j in range(m):
-                if ((j % 2) == 0 and (i % 2) == 0) or ((j % 2) == 1 and (i % 2) == 1):
-                    self.__mMask[0][k] = 1
-                    self.__mMask[1][k] = 0
-                else:
-                    self.__mMask[0][k] = 0
-                    self.__mMask[1][k] = 1
-                k += 1
+        i, j = numpy.divmod(numpy.arange(m * n), m)
+        positive = (i % 2) == (j % 2)
+        self.__mMask = numpy.stack((positive, ~positive))
 
         self.__mM = m
         self.__mN = n
@@ -33,74 +28,22 @@ class RSAnalysis:
         color: int = ANALYSIS_COLOR_GRAYSCALE,
         overlap: bool = True,
     ) -> bool:
+        return self.getResults(image, color, overlap)[26] > 0.01
+
+    def getResults(
+        self,
+        image: PIL.Image.Image,
+        color: int = ANALYSIS_COLOR_GRAYSCALE,
+        overlap: bool = True,
+    ) -> list[float]:
         imgx: int = image.width
         imgy: int = image.height
 
-        startx: int = 0
-        starty: int = 0
-        block: list[int] = [0] * (self.__mM * self.__mN)
-
-        numregular: float = 0
-        numsingular: float = 0
-        numnegreg: float = 0
-        numnegsing: float = 0
-        numunusable: float = 0
-        numnegunusable: float = 0
-        variationB: float
-        variationP: float
-        variationN: float
-
-        pixels = image.load()
-        if pixels is None:
-            raise BaseException("pixels is none")
-
-        while startx < imgx and starty < imgy:
-            for m in range(2):
-                k: int = 0
-                for i in range(self.__mN):
-                    for j in range(self.__mM):
-                        block[k] = pixels[startx + j, starty + i]
-                        k += 1
-
-                variationB = self.__getVariation(block, color)
-
-                block = self.__flipBlock(block, self.__mMask[m])
-                variationP = self.__getVariation(block, color)
-                block = self.__flipBlock(block, self.__mMask[m])
-
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-                variationN = self.__getNegativeVariation(block, color, self.__mMask[m])
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-
-                if variationP > variationB:
-                    numregular += 1
-                if variationP < variationB:
-                    numsingular += 1
-                if variationP == variationB:
-                    numunusable += 1
-
-                if variationN > variationB:
-                    numnegreg += 1
-                if variationN < variationB:
-                    numnegsing += 1
-                if variationN == variationB:
-                    numnegunusable += 1
-
-            if overlap:
-                startx += 1
-            else:
-                startx += self.__mM
-
-            if startx >= (imgx - 1):
-                startx = 0
-                if overlap:
-                    starty += 1
-                else:
-                    starty += self.__mN
-            if starty >= (imgy - 1):
-                break
-        totalgroups: float = numregular + numsingular + numunusable
-        allpixels: list[float] = self.__getAllPixelFlips(image, color, overlap)
+        groups = self.__getGroups(image, color, overlap)
+        counts, allpixels = self.__classifyGroups(groups)
+        numregular, numsingular, numnegreg, numnegsing = counts
+
+        totalgroups: float = groups.shape[0] * len(self.__mMask)
         x: float = self.__getX(
             numregular,
             numnegreg,
@@ -157,7 +100,7 @@ class RSAnalysis:
         results[26] = ml
         results[27] = ((imgx * imgy * 3) * ml) / 8
 
-        return ml > 0.01
+        return results
 
     def __getX(
         self,
@@ -210,88 +153,74 @@ class RSAnalysis:
 
         return x
 
-    def __getAllPixelFlips(
+    def __getGroups(
         self, image: PIL.Image.Image, color: int, overlap: bool
-    ) -> list[float]:
-        allmask: list[int] = [1] * (self.__mM * self.__mN)
-
-        imgx: int = image.width
-        imgy: int = image.height
+    ) -> numpy.ndarray:
+        pixels = numpy.asarray(image, dtype=numpy.int16)
+        if pixels.ndim != 2:
+            raise BaseException("only single channel images are supported")
 
-        startx: int = 0
-        starty: int = 0
-        block: list[int] = [0] * (self.__mM * self.__mN)
-
-        numregular: float = 0
-        numsingular: float = 0
-        numnegreg: float = 0
-        numnegsing: float = 0
-        numunusable: float = 0
-        numnegunusable: float = 0
-        variationB: float
-        variationP: float
-        variationN: float
-
-        pixels = image.load()
-        if pixels is None:
-            raise BaseException("pixels is none")
-
-        while startx < imgx and starty < imgy:
-            for m in range(2):
-                k: int = 0
-                for i in range(self.__mN):
-                    for j in range(self.__mM):
-                        block[k] = pixels[startx + j, starty + i]
-                        k += 1
-
-                block = self.__flipBlock(block, allmask)
-
-                variationB = self.__getVariation(block, color)
-
-                block = self.__flipBlock(block, self.__mMask[m])
-                variationP = self.__getVariation(block, color)
-                block = self.__flipBlock(block, self.__mMask[m])
-
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-                variationN = self.__getNegativeVariation(block, color, self.__mMask[m])
-                self.__mMask[m] = self.__invertMask(self.__mMask[m])
-
-                if variationP > variationB:
-                    numregular += 1
-                if variationP < variationB:
-                    numsingular += 1
-                if variationP == variationB:
-                    numunusable += 1
-
-                if variationN > variationB:
-                    numnegreg += 1
-                if variationN < variationB:
-                    numnegsing += 1
-                if variationN == variationB:
-                    numnegunusable += 1
-
-            if overlap:
-                startx += 1
-            else:
-                startx += self.__mM
+        if overlap:
+            stepx, stepy = 1, 1
+        else:
+            stepx, stepy = self.__mM, self.__mN
 
-            if startx >= (imgx - 1):
-                startx = 0
-                if overlap:
-                    starty += 1
-                else:
-                    starty += self.__mN
-            if starty >= (imgy - 1):
-                break
+        # every group origin visited by the scan, one row of m * n pixels each
+        windows = numpy.lib.stride_tricks.sliding_window_view(
+            pixels, (self.__mN, self.__mM)
+        )[: image.height - 1 : stepy, : image.width - 1 : stepx]
+        return windows.reshape(-1, self.__mM * self.__mN)
 
+    def __classifyGroups(
+        self, groups: numpy.ndarray
+    ) -> tuple[list[float], list[float]]:
         results: list[float] = [0] * 4
+        allpixels: list[float] = [0] * 4
+
+        allflipped = self.__NEGATE_LSB[groups]
+        variationB = self.__getVariation(groups)
+        variationAllB = self.__getVariation(allflipped)
+        variationP = [
+            self.__getVariation(self.__flipGroups(groups, mask, self.__NEGATE_LSB))
+            for mask in self.__mMask
+        ]
+
+        for m, mask in enumerate(self.__mMask):
+            variationN = self.__getVariation(
+                self.__flipGroups(groups, mask, self.__INVERT_LSB)
+            )
+            self.__countGroups(results, variationB, variationP[m], variationN)
+
+            # flipping one mask over the all flipped groups leaves only
+            # the complementary mask flipped relative to the original ones
+            variationAllN = self.__getVariation(
+                self.__flipGroups(allflipped, mask, self.__INVERT_LSB)
+            )
+            self.__countGroups(
+                allpixels, variationAllB, variationP[1 - m], variationAllN
+            )
+
+        return results, allpixels
 
-        results[0] = numregular
-        results[1] = numsingular
-        results[2] = numnegreg
-        results[3] = numnegsing
+    @staticmethod
+    def __flipGroups(
+        groups: numpy.ndarray, mask: numpy.ndarray, table: numpy.ndarray
+    ) -> numpy.ndarray:
+        flipped = groups.copy()
+        flipped[:, mask] = table[groups[:, mask]]
+        return flipped
 
-        return results
+    @staticmethod
+    def __countGroups(
+        counts: list[float],
+        variationB: numpy.ndarray,
+        variationP: numpy.ndarray,
+        variationN: numpy.ndarray,
+    ):
+        counts[0] += int(numpy.count_nonzero(variationP > variationB))
+        counts[1] += int(numpy.count_nonzero(variationP < variationB))
+        counts[2] += int(numpy.count_nonzero(variationN > variationB))
+        counts[3] += int(numpy.count_nonzero(variationN < variationB))
 
     @staticmethod
     def getResultNames() -> tuple[str, ...]:
@@ -326,89 +255,13 @@ class RSAnalysis:
             "Estimated message length (in bytes)",
         )
 
-    def __getVariation(self, block: list[int], color: int) -> float:
-        var: float = 0
-        color1: int
-        color2: int
-        for i in range(0, len(block), 4):
-            color1 = self.__getPixelColor(block[0 + i], color)
-            color2 = self.__getPixelColor(block[1 + i], color)
-            var += numpy.abs(color1 - color2)
-            color1 = self.__getPixelColor(block[3 + i], color)
-            color2 = self.__getPixelColor(block[2 + i], color)
-            var += numpy.abs(color1 - color2)
-            color1 = self.__getPixelColor(block[1 + i], color)
-            color2 = self.__getPixelColor(block[3 + i], color)
-            var += numpy.abs(color1 - color2)
-            color1 = self.__getPixelColor(block[2 + i], color)
-            color2 = self.__getPixelColor(block[0 + i], color)
-            var += numpy.abs(color1 - color2)
-        return var
-
-    def __getNegativeVariation(
-        self, block: list[int], color: int, mask: list[int]
-    ) -> float:
-        var: float = 0
-        color1: int
-        color2: int
-        for i in range(0, len(block), 4):
-            color1 = self.__getPixelColor(block[0 + i], color)
-            color2 = self.__getPixelColor(block[1 + i], color)
-            if mask[0 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[1 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += numpy.abs(color1 - color2)
-
-            color1 = self.__getPixelColor(block[1 + i], color)
-            color2 = self.__getPixelColor(block[3 + i], color)
-            if mask[1 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[3 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += numpy.abs(color1 - color2)
-
-            color1 = self.__getPixelColor(block[3 + i], color)
-            color2 = self.__getPixelColor(block[2 + i], color)
-            if mask[3 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[2 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += numpy.abs(color1 - color2)
-
-            color1 = self.__getPixelColor(block[2 + i], color)
-            color2 = self.__getPixelColor(block[0 + i], color)
-            if mask[2 + i] == -1:
-                color1 = self.__invertLSB(color1)
-            if mask[0 + i] == -1:
-                color2 = self.__invertLSB(color2)
-            var += numpy.abs(color1 - color2)
-        return var
-
-    def __getPixelColor(self, pixel: int, color: int) -> int:
-        return pixel
-
-    def __flipBlock(self, block: list[int], mask: list[int]) -> list[int]:
-        for i in range(len(block)):
-            if mask[i] == 1:
-                block[i] = self.__negateLSB(block[i])
-            elif mask[i] == -1:
-                block[i] = self.__invertLSB(block[i])
-        return block
-
-    def __negateLSB(self, abyte: int) -> int:
-        temp = abyte & 0xFE
-        if temp == abyte:
-            return abyte | 0x1
-        else:
-            return temp
-
-    def __invertLSB(self, abyte: int) -> int:
-        if abyte == 255:
-            return 256
-        if abyte == 256:
-            return 255
-        return self.__negateLSB(abyte + 1) - 1
-
-    def __invertMask(self, mask: list[int]) -> list[int]:
-        return [x * -1 for x in mask]
+    def __getVariation(self, groups: numpy.ndarray) -> numpy.ndarray:
+        chunks = groups.reshape(groups.shape[0], groups.shape[1] // 4, 4)
+        c0, c1, c2, c3 = (chunks[:, :, index] for index in range(4))
+        var = (
+            numpy.abs(c0 - c1)
+            + numpy.abs(c3 - c2)
+            + numpy.abs(c1 - c3)
+            + numpy.abs(c2 - c0)
+        )
+        return var.sum(axis=1)
@@ -1,17 +1,18 @@
 import PIL.Image
+import numpy
 
 
 class VisualAttacker:
     @staticmethod
     def attack_image(img_in: PIL.Image.Image, bit_index: int) -> PIL.Image.Image:
-        img = PIL.Image.new("L", img_in.size)
-        pixels_in = img_in.load()
-        pixels = img.load()
+        pixels = numpy.asarray(img_in, dtype=numpy.uint8)
+        plane = (pixels >> bit_index) & 1
+        return PIL.Image.fromarray(plane * numpy.uint8(255))
 
-        if pixels_in is None or pixels is None:
-            raise BaseException("pixel arrays are none")
-
-        for x in range(img.size[0]):
-            for y in range(img.size[1]):
-                pixels[x, y] = 255 * (pixels_in[x, y] & (1 << bit_index))
-        return img
+    @staticmethod
+    def attack_image_planes(img_in: PIL.Image.Image) -> list[PIL.Image.Image]:
+        pixels = numpy.asarray(img_in, dtype=numpy.uint8)
+        # planes[i] holds bit i of every pixel, least significant first
+        planes = numpy.unpackbits(pixels[None], axis=0, bitorder="little")
+        planes *= 255
+        return [PIL.Image.fromarray(plane) for plane in planes]
@@ -66,10 +66,10 @@ class AnalyseWorker(PyQt6.QtCore.QThread):
                     )
                 
                 case AnalyseWorker.Methods.LSB_SEQUENTIAL:
-                    cap = control.LSBMessage.get_max_capacity(image, message)
-                    return control.LSBMessage.inject_message(
-                        image, message[: cap * percent // 100]
+                    img, _ = control.LSBMessage.inject_message_share(
+                        image, message, percent
                     )
+                    return img
                 case AnalyseWorker.Methods.LSB_SCALED:
                     cap = control.LSBScaledMessage.get_max_capacity(image)
                     return control.LSBScaledMessage.inject_message(
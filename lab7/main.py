@@ -7,8 +7,43 @@ from PIL import Image
 import random
 from bitarray import bitarray
 import os
+import sys
 from collections import Counter
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import payload
+
+
+# --- Таблица оптимальных пар для интерполяции: PAIR_LUT[p1, p2, bit] -> (p1', p2')
+def build_pair_lut(max_delta=4):
+    deltas = [(d1, d2) for d1 in range(-max_delta, max_delta + 1) for d2 in range(-max_delta, max_delta + 1)]
+    # порядок min((diff, np1, np2)) при фиксированных p1, p2
+    deltas.sort(key=lambda d: (abs(d[0]) + abs(d[1]), d[0], d[1]))
+    d1, d2 = np.array(deltas, dtype=np.int16).T
+
+    p1, p2 = np.meshgrid(np.arange(256, dtype=np.int16), np.arange(256, dtype=np.int16), indexing='ij')
+    mid = (p1 + p2) // 2
+    lut = np.empty((256, 256, 2, 2), dtype=np.uint8)
+
+    for bit in (0, 1):
+        # при несовпадении бита середина сдвигается на 1 к нужной четности
+        target = np.where(mid % 2 == bit, mid, np.where(mid % 2 == 0, mid + 1, mid - 1))
+        np1 = p1[..., None] + d1
+        np2 = p2[..., None] + d2
+        valid = (np1 >= 0) & (np1 <= 255) & (np2 >= 0) & (np2 <= 255) & ((np1 + np2) // 2 == target[..., None])
+        first = valid.argmax(axis=-1)
+        found = valid.any(axis=-1) & (mid % 2 != bit)
+
+        best1 = np.take_along_axis(np1, first[..., None], axis=-1)[..., 0]
+        best2 = np.take_along_axis(np2, first[..., None], axis=-1)[..., 0]
+        lut[..., bit, 0] = np.where(found, best1, p1)
+        lut[..., bit, 1] = np.where(found, best2, p2)
+
+    return lut
+
+
+PAIR_LUT = build_pair_lut()
+
 class SteganographyApp:
     def __init__(self, root):
         self.root = root
@@ -172,34 +207,32 @@ class SteganographyApp:
 
     # --- Битовые утилиты ---
     def str_to_bits(self, s):
-        return [int(b) for c in s for b in format(ord(c), '08b')]
+        return payload.text_to_bits(s)
 
     def bits_to_str(self, bits):
-        chars = []
-        for i in range(0, len(bits), 8):
-            byte = bits[i:i+8]
-            if len(byte) < 8:
-                break
-            chars.append(chr(int(''.join(map(str, byte)), 2)))
-        return ''.join(chars)
+        return payload.bits_to_text(bits)
+
+    def keystream(self, key, length):
+        # ключ повторяется по кругу до длины сообщения
+        key = np.asarray(key, dtype=np.uint8)
+        return np.tile(key, -(-length // len(key)))[:length]
 
     def xor_bits(self, bits, key):
-        return [b ^ key[i % len(key)] for i, b in enumerate(bits)]
+        bits = np.asarray(bits, dtype=np.uint8)
+        return bits ^ self.keystream(key, len(bits))
     
     def get_full_bits(self, message_bits):
-        length_bits = [int(b) for b in format(len(message_bits), '032b')]
-        return length_bits + message_bits
+        return payload.add_length(message_bits)
     
     def extracted_bits_message(self, extracted_bits):
-        extracted_len = int("".join(map(str, extracted_bits[:32])), 2)
+        extracted_len = payload.read_length(extracted_bits)
         print(f"Extracted length: {extracted_len}")
-        return extracted_bits[32:32 + extracted_len]
+        return extracted_bits[payload.LENGTH_BITS:payload.LENGTH_BITS + extracted_len]
 
-    # --- Хэш-функция (линейная) ---
+    # --- Хэш-функция (линейная), block может быть матрицей (n_blocks, N) ---
     def linear_hash_matrix(self, block, A):
-        x = np.array(block, dtype=int)
-        result = (A @ x) % 2
-        return result.tolist()
+        x = np.asarray(block, dtype=int)
+        return (x @ A.T) % 2
 
     # --- Линейная хэш-функция: lambda(x) = A * x mod 2 ---
     def generate_random_binary_matrix(self, m, N, seed=None):
@@ -209,32 +242,28 @@ class SteganographyApp:
 
     def add_matrix_hash_blocks(self, bits, block_size=8, A=None):
         assert A is not None, "Матрица A обязательна"
-        m = A.shape[0]
-        hashed = []
+        bits = np.asarray(bits, dtype=np.uint8)
 
-        for i in range(0, len(bits), block_size):
-            block = bits[i:i+block_size]
-            if len(block) < block_size:
-                break
-            h = self.linear_hash_matrix(block, A)
-            hashed.extend(block + h)
+        # неполный последний блок отбрасывается
+        n_blocks = len(bits) // block_size
+        blocks = bits[:n_blocks * block_size].reshape(n_blocks, block_size)
+        hashes = self.linear_hash_matrix(blocks, A).astype(np.uint8)
 
-        return hashed
+        return np.hstack((blocks, hashes)).ravel()
 
     def check_and_extract_matrix_hash_blocks(self, bits, block_size=8, A=None):
         assert A is not None, "Матрица A обязательна"
         m = A.shape[0]
-        recovered = []
-
-        for i in range(0, len(bits), block_size + m):
-            block = bits[i:i+block_size]
-            h = bits[i+block_size:i+block_size+m]
-            if len(block) < block_size or len(h) < m:
-                break
-            expected_h = self.linear_hash_matrix(block, A)
-            if h == expected_h:
-                recovered.extend(block)
-        return recovered
+        bits = np.asarray(bits, dtype=np.uint8)
+
+        step = block_size + m
+        n_blocks = len(bits) // step
+        chunks = bits[:n_blocks * step].reshape(n_blocks, step)
+        blocks, h = chunks[:, :block_size], chunks[:, block_size:]
+
+        # маска блоков, у которых хэш совпал
+        valid = (self.linear_hash_matrix(blocks, A) == h).all(axis=1)
+        return blocks[valid].ravel()
 
  
 
@@ -243,42 +272,18 @@ class SteganographyApp:
     def interpolation_method(self, img_array, full_message_bits):
         height, width = img_array.shape
         stego_array = img_array.copy()
-        idx = 0
-        total_bits = len(full_message_bits)
-
-        for i in range(height):
-            for j in range(0, width - 1, 2):
-                if idx >= total_bits:
-                    return stego_array
-
-                p1 = int(stego_array[i, j])
-                p2 = int(stego_array[i, j + 1])
-                mid = (p1 + p2) // 2
-                desired_bit = full_message_bits[idx]
-
-                current_bit = mid % 2
-                if current_bit != desired_bit:
-                    if mid % 2 == 0:
-                        mid += 1
-                    else:
-                        mid -= 1
-
-                    candidates = []
-                    for delta1 in range(-4, 5):
-                        for delta2 in range(-4, 5):
-                            np1 = p1 + delta1
-                            np2 = p2 + delta2
-                            if 0 <= np1 <= 255 and 0 <= np2 <= 255 and (np1 + np2) // 2 == mid:
-                                diff = abs(delta1) + abs(delta2)
-                                candidates.append((diff, np1, np2))
-
-                    if candidates:
-                        _, new_p1, new_p2 = min(candidates)
-                        stego_array[i, j] = new_p1
-                        stego_array[i, j + 1] = new_p2
-
-                idx += 1
 
+        # пары (j, j + 1) по строкам, нечетный последний столбец не используется
+        pair_width = width - width % 2
+        pairs = stego_array[:, :pair_width].reshape(-1, 2)
+        count = min(len(full_message_bits), len(pairs))
+        bits = np.asarray(full_message_bits[:count], dtype=np.intp)
+
+        p1 = pairs[:count, 0].astype(np.intp)
+        p2 = pairs[:count, 1].astype(np.intp)
+        pairs[:count] = PAIR_LUT[p1, p2, bits]
+
+        stego_array[:, :pair_width] = pairs.reshape(height, pair_width)
         return stego_array
 
     def embed_message_standard(self):
@@ -326,7 +331,7 @@ class SteganographyApp:
         if not (use_standard or use_hash):
             messagebox.showerror("Error", "Please select at least one extraction mode.")
             return
-        extracted_bits = self.extract_bits_form_stego(self.stego_image)
+        extracted_bits = self.extract_embedded_bits(self.stego_image)
 
         if use_standard:
             self.extract_standard(extracted_bits)
@@ -334,19 +339,26 @@ class SteganographyApp:
             self.extract_with_hash(extracted_bits, self.key)
 
     
-    def extract_bits_form_stego(self, stego_array):
+    def extract_bits_form_stego(self, stego_array, count=None):
         height, width = stego_array.shape
-        bits = []
-        for i in range(height):
-            for j in range(0, width - 1, 2):
-                p1 = int(stego_array[i, j])
-                p2 = int(stego_array[i, j + 1])
-                interp = (p1 + p2) // 2
-                bits.append(interp % 2)
-        
-        return bits
-    
-    
+        pairs_per_row = width // 2
+        if count is None:
+            count = height * pairs_per_row
+        count = min(count, height * pairs_per_row)
+        if count == 0:
+            return np.zeros(0, dtype=np.uint8)
+
+        # читаем только строки, в которые попадают первые count пар
+        rows = -(-count // pairs_per_row)
+        pairs = stego_array[:rows, :2 * pairs_per_row].reshape(-1, 2)[:count].astype(np.intp)
+        return ((pairs[:, 0] + pairs[:, 1]) // 2 % 2).astype(np.uint8)
+
+    def extract_embedded_bits(self, stego_array):
+        # сначала 32 пары заголовка, затем ровно столько пар, сколько занимает сообщение
+        header = self.extract_bits_form_stego(stego_array, payload.LENGTH_BITS)
+        length = payload.read_length(header)
+        return self.extract_bits_form_stego(stego_array, payload.LENGTH_BITS + length)
+
     def extract_standard(self, extracted_bits):
         extrcted_bit = self.extracted_bits_message(extracted_bits)
         self.output_text.insert(tk.END, '\n📊 Максимально получилось встроить: '+ str(len(extrcted_bit))+'\n')
@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
 import os
+import whitespace_stego
 
 class TextStegoApp:
     def __init__(self, root):
@@ -130,6 +131,16 @@ class TextStegoApp:
                                style='Primary.TButton')
         extract_btn.pack(side=tk.LEFT, padx=(10, 0))
         
+        embed_stream_btn = ttk.Button(btn_frame, text="Встроить в файл (поток)", 
+                                    command=self.embed_message_stream, 
+                                    style='Secondary.TButton')
+        embed_stream_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
+        extract_stream_btn = ttk.Button(btn_frame, text="Извлечь из файла (поток)", 
+                                      command=self.extract_message_stream, 
+                                      style='Secondary.TButton')
+        extract_stream_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Секция результата
         result_frame = ttk.LabelFrame(main_frame, text="Результат", padding="10 10 10 10")
         result_frame.pack(fill=tk.BOTH, expand=True)
@@ -205,34 +216,15 @@ class TextStegoApp:
             self.status_var.set("Ошибка: сообщение не введено")
             return
 
-        message += '\0'  # стоп-символ
-        binary = ''.join(f"{ord(c):08b}" for c in message)
-
-        # Разделение по словам вручную
-        words = []
-        word = ''
-        for ch in self.text_data:
-            if ch.isspace():
-                if word:
-                    words.append(word)
-                    word = ''
-            else:
-                word += ch
-        if word:
-            words.append(word)
+        binary = whitespace_stego.message_to_bits(message)
+        words = self.text_data.split()
 
         if len(words) < len(binary):
             messagebox.showerror("Недостаточно текста", "Недостаточно слов для скрытия сообщения.")
             self.status_var.set("Ошибка: недостаточно слов в тексте")
             return
 
-        embedded_text = ''
-        for i, word in enumerate(words):
-            embedded_text += word
-            if i < len(binary):
-                embedded_text += '  ' if binary[i] == '1' else ' '
-            else:
-                embedded_text += ' '
+        embedded_text = whitespace_stego.embed(words, binary)
 
         self.text_data = embedded_text
         capacity = len(words)
@@ -254,33 +246,11 @@ class TextStegoApp:
             self.status_var.set("Ошибка: текст не загружен")
             return
 
-        bits = ''
-        i = 0
-        while i < len(self.text_data):
-            if self.text_data[i].isspace():
-                space_count = 0
-                while i < len(self.text_data) and self.text_data[i] == ' ':
-                    space_count += 1
-                    i += 1
-                if space_count == 1:
-                    bits += '0'
-                elif space_count == 2:
-                    bits += '1'
-            else:
-                i += 1
-
-        chars = []
-        for j in range(0, len(bits), 8):
-            byte = bits[j:j+8]
-            if len(byte) < 8:
-                break
-            ch = chr(int(byte, 2))
-            if ch == '\0':
-                break
-            chars.append(ch)
-
-        message = ''.join(chars)
+        message = whitespace_stego.extract(self.text_data)
         
+        self.show_extracted(message)
+
+    def show_extracted(self, message):
         if message:
             self.update_output(f"Извлечённое сообщение:\n\n{message}")
             self.status_var.set(f"Сообщение успешно извлечено")
@@ -288,6 +258,67 @@ class TextStegoApp:
             self.update_output("Сообщение не найдено или повреждено.")
             self.status_var.set("Сообщение не обнаружено")
 
+    # Потоковый режим: файл читается и записывается блоками, без загрузки в память
+    def embed_message_stream(self):
+        message = self.message_entry.get()
+        if not message:
+            messagebox.showwarning("Ошибка", "Введите сообщение.")
+            self.status_var.set("Ошибка: сообщение не введено")
+            return
+
+        src_path = filedialog.askopenfilename(title="Исходный текст", filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not src_path:
+            return
+        dst_path = filedialog.asksaveasfilename(
+            title="Сохранить результат",
+            defaultextension=".txt", 
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not dst_path:
+            return
+
+        binary = whitespace_stego.message_to_bits(message)
+        try:
+            with open(src_path, "r", encoding="utf-8") as src, open(dst_path, "w", encoding="utf-8") as dst:
+                capacity = whitespace_stego.embed_stream(src, dst, binary)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось обработать файл: {str(e)}")
+            self.status_var.set("Ошибка при потоковой обработке файла")
+            return
+
+        if capacity < len(binary):
+            os.remove(dst_path)
+            messagebox.showerror("Недостаточно текста", "Недостаточно слов для скрытия сообщения.")
+            self.status_var.set("Ошибка: недостаточно слов в тексте")
+            return
+
+        used = len(binary)
+        percent = used / capacity * 100
+        filename = os.path.basename(dst_path)
+        
+        info_text = (f"Сообщение успешно встроено в '{filename}'!\n\n"
+                   f"Статистика:\n"
+                   f"• Использовано {used} из {capacity} слов\n"
+                   f"• Заполнено {percent:.2f}% доступного пространства")
+        
+        self.update_output(info_text)
+        self.status_var.set(f"Сообщение встроено ({percent:.2f}% заполнения)")
+
+    def extract_message_stream(self):
+        filepath = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not filepath:
+            return
+
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                message = whitespace_stego.extract_stream(f)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать файл: {str(e)}")
+            self.status_var.set("Ошибка при потоковой обработке файла")
+            return
+
+        self.show_extracted(message)
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = TextStegoApp(root)
@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
+import os
+import whitespace_stego
 
 class TextStegoApp:
     def __init__(self, root):
@@ -24,6 +26,8 @@ class TextStegoApp:
         ttk.Button(btn_frame, text="Встроить сообщение", command=self.embed_message).grid(row=0, column=0, padx=5)
         ttk.Button(btn_frame, text="Сохранить результат", command=self.save_text).grid(row=0, column=1, padx=5)
         ttk.Button(btn_frame, text="Извлечь сообщение", command=self.extract_message).grid(row=0, column=2, padx=5)
+        ttk.Button(btn_frame, text="Встроить в файл (поток)", command=self.embed_message_stream).grid(row=1, column=0, padx=5, pady=5)
+        ttk.Button(btn_frame, text="Извлечь из файла (поток)", command=self.extract_message_stream).grid(row=1, column=2, padx=5, pady=5)
 
         self.output_label = tk.Label(self.root, text="", wraplength=560, justify="left", bg="#f4f4f4", fg="#333", anchor="w")
         self.output_label.pack(fill="both", expand=True, pady=(10, 0))
@@ -55,33 +59,14 @@ class TextStegoApp:
             messagebox.showwarning("Ошибка", "Введите сообщение.")
             return
 
-        message += '\0'  # стоп-символ
-        binary = ''.join(f"{ord(c):08b}" for c in message)
-
-        # Разделение по словам вручную
-        words = []
-        word = ''
-        for ch in self.text_data:
-            if ch.isspace():
-                if word:
-                    words.append(word)
-                    word = ''
-            else:
-                word += ch
-        if word:
-            words.append(word)
+        binary = whitespace_stego.message_to_bits(message)
+        words = self.text_data.split()
 
         if len(words) < len(binary):
             messagebox.showerror("Недостаточно текста", "Недостаточно слов для скрытия сообщения.")
             return
 
-        embedded_text = ''
-        for i, word in enumerate(words):
-            embedded_text += word
-            if i < len(binary):
-                embedded_text += '  ' if binary[i] == '1' else ' '
-            else:
-                embedded_text += ' '
+        embedded_text = whitespace_stego.embed(words, binary)
 
         self.text_data = embedded_text
         capacity = len(words)
@@ -94,32 +79,42 @@ class TextStegoApp:
             messagebox.showwarning("Ошибка", "Нет текста для анализа.")
             return
 
-        bits = ''
-        i = 0
-        while i < len(self.text_data):
-            if self.text_data[i].isspace():
-                space_count = 0
-                while i < len(self.text_data) and self.text_data[i] == ' ':
-                    space_count += 1
-                    i += 1
-                if space_count == 1:
-                    bits += '0'
-                elif space_count == 2:
-                    bits += '1'
-            else:
-                i += 1
-
-        chars = []
-        for j in range(0, len(bits), 8):
-            byte = bits[j:j+8]
-            if len(byte) < 8:
-                break
-            ch = chr(int(byte, 2))
-            if ch == '\0':
-                break
-            chars.append(ch)
-
-        message = ''.join(chars)
+        message = whitespace_stego.extract(self.text_data)
+        self.output_label.config(text="Извлечённое сообщение:\n" + message)
+
+    # Потоковый режим: файл читается и записывается блоками, без загрузки в память
+    def embed_message_stream(self):
+        message = self.message_entry.get()
+        if not message:
+            messagebox.showwarning("Ошибка", "Введите сообщение.")
+            return
+
+        src_path = filedialog.askopenfilename(title="Исходный текст", filetypes=[("Text files", "*.txt")])
+        if not src_path:
+            return
+        dst_path = filedialog.asksaveasfilename(title="Сохранить результат", defaultextension=".txt", filetypes=[("Text files", "*.txt")])
+        if not dst_path:
+            return
+
+        binary = whitespace_stego.message_to_bits(message)
+        with open(src_path, "r", encoding="utf-8") as src, open(dst_path, "w", encoding="utf-8") as dst:
+            capacity = whitespace_stego.embed_stream(src, dst, binary)
+
+        if capacity < len(binary):
+            os.remove(dst_path)
+            messagebox.showerror("Недостаточно текста", "Недостаточно слов для скрытия сообщения.")
+            return
+
+        used = len(binary)
+        percent = used / capacity * 100
+        messagebox.showinfo("Готово", f"Сообщение встроено. Использовано {used} из {capacity} слов (%.2f%%)." % percent)
+
+    def extract_message_stream(self):
+        filepath = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
+        if not filepath:
+            return
+        with open(filepath, "r", encoding="utf-8") as f:
+            message = whitespace_stego.extract_stream(f)
         self.output_label.config(text="Извлечённое сообщение:\n" + message)
 
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+import itertools
+import re
+
+# Серия из одного пробела - бит 0, из двух - бит 1, более длинные серии бит не несут
+BIT_RUN = re.compile(r'(?<! ) {1,2}(?! )')
+
+
+def message_to_bits(message):
+    message += '\0'  # стоп-символ
+    return ''.join(f"{ord(c):08b}" for c in message)
+
+
+def embed(words, binary):
+    # Слова с битами получают один или два пробела, остальные - один
+    head = ''.join(word + ('  ' if bit == '1' else ' ') for word, bit in zip(words, binary))
+    rest = words[len(binary):]
+    tail = ' '.join(rest) + ' ' if rest else ''
+    return head + tail
+
+
+def decode_bits(runs):
+    # Читаем по 8 серий до стоп-символа, не просматривая остаток текста
+    chars = []
+    while True:
+        byte = ''.join('1' if len(run.group()) == 2 else '0' for run in itertools.islice(runs, 8))
+        if len(byte) < 8:
+            break
+        ch = chr(int(byte, 2))
+        if ch == '\0':
+            break
+        chars.append(ch)
+    return ''.join(chars)
+
+
+def extract(text):
+    return decode_bits(BIT_RUN.finditer(text))
+
+
+# --- Потоковый режим: текст читается блоками, память не зависит от размера файла
+CHUNK_SIZE = 1 << 20
+
+
+def iter_words(src, chunk_size=CHUNK_SIZE):
+    # Незаконченное слово в конце блока переносится в следующий блок
+    carry = ''
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        chunk = carry + chunk
+        words = chunk.split()
+        carry = words.pop() if words and not chunk[-1].isspace() else ''
+        yield words
+    if carry:
+        yield [carry]
+
+
+def embed_stream(src, dst, binary, chunk_size=CHUNK_SIZE):
+    # Возвращает число слов в тексте (емкость); запись идет по мере чтения
+    position = 0
+    for words in iter_words(src, chunk_size):
+        dst.write(embed(words, binary[position:position + len(words)]))
+        position += len(words)
+    return position
+
+
+def iter_runs(src, chunk_size=CHUNK_SIZE):
+    # Пробелы в конце блока переносятся, чтобы серия не разрывалась на границе
+    carry = ''
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        chunk = carry + chunk
+        body = chunk.rstrip(' ')
+        carry = chunk[len(body):]
+        yield from BIT_RUN.finditer(body)
+    yield from BIT_RUN.finditer(carry)
+
+
+def extract_stream(src, chunk_size=CHUNK_SIZE):
+    return decode_bits(iter_runs(src, chunk_size))
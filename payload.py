@@ -0,0 +1,34 @@
+import numpy as np
+
+# Общий кодек сообщений: текст <-> массив бит (uint8, по одному биту на элемент)
+
+LENGTH_BITS = 32
+
+
+def text_to_bits(text):
+    data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    return np.unpackbits(data)
+
+
+def bits_to_text(bits):
+    bits = np.asarray(bits, dtype=np.uint8)
+    # неполный последний байт отбрасывается
+    data = np.packbits(bits[:len(bits) // 8 * 8]).tobytes()
+    return data.decode('utf-8', errors='replace')
+
+
+def add_length(bits):
+    bits = np.asarray(bits, dtype=np.uint8)
+    header = np.unpackbits(np.array([len(bits)], dtype='>u4').view(np.uint8))
+    return np.concatenate((header, bits))
+
+
+def read_length(bits):
+    header = np.asarray(bits[:LENGTH_BITS], dtype=np.uint8)
+    # packbits дополняет нулями справа, сдвиг убирает их для короткого заголовка
+    return int.from_bytes(np.packbits(header).tobytes(), 'big') >> (-len(header) % 8)
+
+
+def split_length(bits):
+    length = read_length(bits)
+    return bits[LENGTH_BITS:LENGTH_BITS + length]
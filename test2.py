@@ -9,10 +9,55 @@ class MixingHashFunction:
         self.m = m
         # Создаем случайную бинарную матрицу преобразования
         self.matrix = np.random.randint(0, 2, (m, N))
+        self.word_bytes = (N + 7) // 8
+        self.tables = self._build_tables() if N <= 64 else None
     
+    def _build_tables(self):
+        # Столбец матрицы как m-битное число (строка 0 - старший бит)
+        weights = np.uint64(1) << np.arange(self.m - 1, -1, -1, dtype=np.uint64)
+        columns = np.bitwise_or.reduce(self.matrix.astype(np.uint64) * weights[:, None], axis=0)
+
+        # Бит b числа int(word, 2) соответствует столбцу N - 1 - b
+        bit_values = np.zeros(self.word_bytes * 8, dtype=np.uint64)
+        bit_values[:self.N] = columns[::-1]
+        bit_values = bit_values.reshape(self.word_bytes, 8)
+
+        # Хеш линеен над GF(2): вклад байта - XOR вкладов его единичных битов
+        byte_bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder='little')
+        contributions = np.where(byte_bits[None, :, :], bit_values[:, None, :], np.uint64(0))
+        return np.bitwise_xor.reduce(contributions, axis=2)
+
+    def hash_words(self, words):
+        """Хеширует массив слов, заданных числами int(word, 2); результат - числа int(hash, 2)"""
+        if self.tables is None:
+            raise ValueError("Упакованные слова поддерживаются только для N ≤ 64")
+
+        words = np.asarray(words, dtype=np.uint64)
+        if self.N < 64 and (words >> np.uint64(self.N)).any():
+            raise ValueError(f"Слова должны помещаться в {self.N} бит")
+
+        result = np.zeros(words.shape, dtype=np.uint64)
+        for lane, table in enumerate(self.tables):
+            result ^= table[(words >> np.uint64(8 * lane)) & np.uint64(0xFF)]
+        return result
+
+    def hash_bytes(self, data):
+        """Хеширует буфер слов по word_bytes байт (big-endian, выравнивание вправо)"""
+        data = np.frombuffer(data, dtype=np.uint8)
+        if data.size % self.word_bytes:
+            raise ValueError(f"Длина буфера должна быть кратна {self.word_bytes} байт")
+
+        padded = np.zeros((data.size // self.word_bytes, 8), dtype=np.uint8)
+        padded[:, 8 - self.word_bytes:] = data.reshape(-1, self.word_bytes)
+        return self.hash_words(padded.view('>u8').ravel())
+
     def hash(self, word):
         if len(word) != self.N:
             raise ValueError(f"Длина входного слова должна быть {self.N}")
+
+        if self.tables is not None:
+            result = int(self.hash_words([int(word, 2)])[0])
+            return format(result, f'0{self.m}b')
             
         # Преобразуем входное слово в numpy массив
         word_array = np.array([int(bit) for bit in word])
@@ -52,5 +97,28 @@ def test_hash_function():
     print(f"Хеш XOR входов: {hash_xor}")
     print(f"Свойство линейности соблюдается: {xor_output == hash_xor}")
 
+def benchmark_hash_function(count=4_000_000):
+    import time
+
+    N, m = 64, 16
+    hash_func = MixingHashFunction(N, m)
+    words = np.random.randint(0, 2 ** 64, count, dtype=np.uint64)
+
+    start = time.perf_counter()
+    hashes = hash_func.hash_words(words)
+    packed_time = time.perf_counter() - start
+
+    # Строковый вариант на небольшой выборке для сравнения
+    sample = [format(int(word), f'0{N}b') for word in words[:10000]]
+    start = time.perf_counter()
+    sample_hashes = [hash_func(word) for word in sample]
+    string_time = time.perf_counter() - start
+
+    matches = all(int(h, 2) == int(p) for h, p in zip(sample_hashes, hashes[:len(sample)]))
+    print(f"Упакованные слова: {count / packed_time:,.0f} слов/с")
+    print(f"Строки: {len(sample) / string_time:,.0f} слов/с")
+    print(f"Результаты совпадают: {matches}")
+
 # Запускаем тест
 test_hash_function()
+benchmark_hash_function()